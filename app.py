@@ -1,10 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
-import pandas as pd
+import queue
+import time
 from core.session_manager import SessionManager
 from core.tem_automation import TEMAutomation
 from core.excel_processor import read_excel
+from core.engine import DEFAULT_MAX_WORKERS
+from core.journal import CheckpointJournal
+from core.preprocess import prepare_dataframe
+from core.metrics import METRICS
+from core.pipeline import terminal_pipeline
+from core.profiling import PROFILER, stage
+from core.snapshot import SNAPSHOT_PATH, Snapshot, export_snapshot
+from core.reconcile import reconcile, write_report, summary
 import logging
 from datetime import datetime
 from PIL import Image, ImageTk
@@ -12,6 +21,11 @@ import os
 
 logging.basicConfig(level=logging.INFO)
 
+# La consola del GUI guarda solo las últimas líneas (buffer circular)
+MAX_LOG_LINES = 2000
+UI_POLL_MS = 100
+MAX_EVENTS_PER_TICK = 5000
+
 class ModernApp:
     def __init__(self, root):
         self.root = root
@@ -30,9 +44,15 @@ class ModernApp:
         self.session_manager = None
         self.tem = None
         self.df = None
+        self.df_invalid = None
+        self.ingest_seconds = 0.0
         self.df_path = None
         self.remaining_time = 0
         self.timer_running = False
+        self.processing = False
+        # Los hilos de trabajo publican aquí; solo el hilo de Tk toca los widgets
+        self.events = queue.Queue()
+        self.counters = {"created": 0, "updated": 0, "unchanged": 0, "error": 0}
 
         # --- Estilos ---
         style = ttk.Style()
@@ -106,6 +126,31 @@ class ModernApp:
         self.start_btn = ttk.Button(self.proc_frame, text="▶ Ejecutar Procesamiento", command=self.start_processing, state="disabled")
         self.start_btn.pack(anchor="w", padx=5, pady=8)
 
+        self.dry_run_btn = ttk.Button(self.proc_frame, text="🔎 Simular (sin escribir)", command=self.start_dry_run, state="disabled")
+        self.dry_run_btn.pack(anchor="w", padx=5, pady=8)
+
+        self.skip_unchanged_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.proc_frame, text="Omitir terminales sin cambios",
+                        variable=self.skip_unchanged_var).pack(anchor="w", padx=5, pady=4)
+
+        self.reconcile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.proc_frame, text="Conciliar al terminar (descarga toda la carpeta)",
+                        variable=self.reconcile_var).pack(anchor="w", padx=5, pady=4)
+
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.proc_frame, text="Perfilar corrida (CPU/memoria)",
+                        variable=self.profile_var).pack(anchor="w", padx=5, pady=4)
+
+        self.prometheus_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.proc_frame, text="Exportar métricas Prometheus (logs/metrics.prom)",
+                        variable=self.prometheus_var).pack(anchor="w", padx=5, pady=4)
+
+        workers_frame = ttk.Frame(self.proc_frame)
+        workers_frame.pack(anchor="w", padx=5, pady=8)
+        ttk.Label(workers_frame, text="Peticiones simultáneas:").pack(side="left")
+        self.workers_var = tk.IntVar(value=DEFAULT_MAX_WORKERS)
+        ttk.Spinbox(workers_frame, from_=1, to=32, width=5, textvariable=self.workers_var).pack(side="left", padx=5)
+
         # --- Panel inferior: barra de progreso y logs ---
         bottom_frame = ttk.Frame(main_frame)
         bottom_frame.pack(fill="both", expand=True)
@@ -113,6 +158,12 @@ class ModernApp:
         self.progress = ttk.Progressbar(bottom_frame, mode="determinate", maximum=100)
         self.progress.pack(fill="x", padx=10, pady=(0,5))
 
+        self.throughput_label = ttk.Label(bottom_frame, text="", font=("Segoe UI", 10))
+        self.throughput_label.pack(anchor="w", padx=10, pady=(0,5))
+
+        self.counters_label = ttk.Label(bottom_frame, text="", font=("Segoe UI", 10, "bold"))
+        self.counters_label.pack(anchor="w", padx=10, pady=(0,5))
+
         log_frame = ttk.Frame(bottom_frame)
         log_frame.pack(fill="both", expand=True, padx=10, pady=(0,10))
 
@@ -139,12 +190,63 @@ class ModernApp:
         footer_label.pack(fill="x")
 
         self.log_msg("💻 Bienvenido. Ingrese sus credenciales y presione 'Conectar'.")
+        self.root.after(UI_POLL_MS, self.drain_events)
 
     # --- Logging ---
     def log_msg(self, msg):
+        """Seguro desde cualquier hilo: solo encola, drain_events lo muestra por lotes."""
         timestamp = datetime.now().strftime("[%H:%M:%S]")
-        self.log_box.insert("end", f"{timestamp} {msg}\n")
-        self.log_box.see("end")
+        self.events.put(("log", f"{timestamp} {msg}\n"))
+
+    def ui(self, fn, *args):
+        """Ejecuta fn(*args) en el hilo de Tk (los widgets no son thread-safe)."""
+        self.events.put(("call", lambda: fn(*args)))
+
+    def drain_events(self):
+        try:
+            with stage("UI"):
+                self._drain_events()
+        except Exception:
+            logging.exception("Error actualizando la interfaz")
+        finally:
+            # Siempre reprogramar: un error en un tick no debe congelar la GUI
+            self.root.after(UI_POLL_MS, self.drain_events)
+
+    def _drain_events(self):
+        lines, calls, progress = [], [], None
+        for _ in range(MAX_EVENTS_PER_TICK):
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                lines.append(value)
+            elif kind == "progress":
+                progress = value
+            elif kind == "count":
+                self.counters[value] += 1
+            elif kind == "call":
+                calls.append(value)
+
+        if lines:
+            self.log_box.insert("end", "".join(lines[-MAX_LOG_LINES:]))
+            excess = int(self.log_box.index("end-1c").split(".")[0]) - MAX_LOG_LINES
+            if excess > 0:
+                self.log_box.delete("1.0", f"{excess + 1}.0")
+            self.log_box.see("end")
+        if progress is not None:
+            self.progress["value"] = progress
+        if any(self.counters.values()):
+            c = self.counters
+            self.counters_label.config(
+                text=f"✅ {c['created']} creados | 🟡 {c['updated']} modificados | "
+                     f"⏭️ {c['unchanged']} sin cambios | ❌ {c['error']} errores"
+            )
+        for fn in calls:
+            try:
+                fn()
+            except Exception:
+                logging.exception("Error en actualización de la interfaz")
 
     # --- Login ---
     def do_login(self):
@@ -164,12 +266,13 @@ class ModernApp:
                 self.session_manager = sm
                 self.tem = TEMAutomation(sm)
                 self.log_msg(f"✅ Sesión iniciada. CSRF: {sm.get_csrf()}")
-                self.load_btn.config(state="normal")
-                self.start_btn.config(state="normal")
-                self.start_timer(900)
+                self.ui(self.load_btn.config, {"state": "normal"})
+                self.ui(self.start_btn.config, {"state": "normal"})
+                self.ui(self.dry_run_btn.config, {"state": "normal"})
+                self.ui(self.start_timer, 900)
             else:
                 self.log_msg(f"❌ Error en login: {msg}")
-            self.login_btn.config(state="normal")
+            self.ui(self.login_btn.config, {"state": "normal"})
 
         threading.Thread(target=worker, daemon=True).start()
 
@@ -186,14 +289,38 @@ class ModernApp:
             self.remaining_time -= 1
             self.root.after(1000, self.update_timer)
         elif self.remaining_time == 0:
-            self.timer_label.config(text="⏰ Sesión expirada")
-            self.login_btn.config(state="normal")
-            self.load_btn.config(state="disabled")
-            self.start_btn.config(state="disabled")
-            self.session_manager = None
-            self.tem = None
             self.timer_running = False
-            self.log_msg("⚠️ La sesión ha expirado, por favor inicie sesión nuevamente.")
+            self.timer_label.config(text="🔄 Renovando sesión...")
+            threading.Thread(target=self.renew_session, daemon=True).start()
+
+    def renew_session(self):
+        """Renueva la sesión en segundo plano (incluso con un procesamiento en curso)."""
+        if self.session_manager is not None and self.session_manager.refresh():
+            self.log_msg("🔄 Sesión renovada automáticamente.")
+            self.ui(self.start_timer, 900)
+            return
+        self.ui(self.expire_session)
+
+    def expire_session(self):
+        self.timer_label.config(text="⏰ Sesión expirada")
+        self.login_btn.config(state="normal")
+        self.load_btn.config(state="disabled")
+        self.start_btn.config(state="disabled")
+        self.dry_run_btn.config(state="disabled")
+        self.session_manager = None
+        self.tem = None
+        self.timer_running = False
+        self.log_msg("⚠️ La sesión ha expirado, por favor inicie sesión nuevamente.")
+
+    # --- Métricas en vivo ---
+    def update_throughput(self):
+        s = METRICS.summary()
+        self.throughput_label.config(
+            text=f"⚡ {s['rows_per_second']} filas/s | {s['rows']} filas | "
+                 f"espera por rate limit {s['throttle_wait']}s"
+        )
+        if self.processing:
+            self.root.after(1000, self.update_throughput)
 
     # --- Excel ---
     def load_excel(self):
@@ -201,47 +328,210 @@ class ModernApp:
         if not path:
             return
         try:
+            # La carga ocurre antes de PROFILER.start(): se mide aparte y se suma al perfilar
+            started = time.perf_counter()
             df = read_excel(path)
-            self.df = df
+            # El GUI solo crea/actualiza: las filas de eliminación quedan como inválidas
+            valid, invalid, report = prepare_dataframe(df, deletes=False)
+            self.ingest_seconds = time.perf_counter() - started
+            self.df = valid
+            self.df_invalid = invalid
             self.df_path = path
             self.log_msg(f"📊 Archivo cargado correctamente ({len(df)} filas).")
+            self.log_msg(f"🧹 Validación ({report['seconds']}s): {report['valid']} válidas, "
+                         f"{report['blank_serial']} sin SERIAL, {report['deletes_rejected']} eliminaciones omitidas, "
+                         f"{report['duplicates']} duplicadas, "
+                         f"{report['normalized_serials']} seriales normalizados.")
+            for idx, row in invalid.head(20).iterrows():
+                self.log_msg(f"⚠️ Fila {idx + 2}: {row['ISSUE']} ({row['SERIAL'] or '-'})")
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    # --- Simulación (modo diff) ---
+    def start_dry_run(self):
+        if self.df is None:
+            messagebox.showwarning("Sin archivo", "Debe cargar un Excel antes de simular.")
+            return
+
+        self.dry_run_btn.config(state="disabled")
+        self.log_msg("🔎 Simulando carga contra el estado actual de Migración...")
+
+        def worker():
+            rows = zip(self.df["SERIAL"], self.df["CODIGO_PUNTO"])
+            report = self.tem.dry_run_report(rows)
+            self.log_msg(f"📋 Crear: {report['CREATE']} | Actualizar: {report['UPDATE']} | "
+                         f"Sin cambios: {report['UNCHANGED']}")
+            self.ui(self.dry_run_btn.config, {"state": "normal"})
+
+        threading.Thread(target=worker, daemon=True).start()
+
     # --- Procesamiento ---
     def start_processing(self):
         if self.df is None:
             messagebox.showwarning("Sin archivo", "Debe cargar un Excel antes de procesar.")
             return
 
+        journal = self.open_journal()
+        if journal is None:
+            return
+
         self.start_btn.config(state="disabled")
         self.progress["value"] = 0
         total = len(self.df)
-        self.log_msg("🚀 Iniciando procesamiento...")
+        try:
+            max_workers = max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            max_workers = DEFAULT_MAX_WORKERS
+        self.log_msg(f"🚀 Iniciando procesamiento ({max_workers} peticiones simultáneas)...")
+
+        self.tem.skip_unchanged = self.skip_unchanged_var.get()
+        METRICS.reset()
+        self.counters = dict.fromkeys(self.counters, 0)
+        self.processing = True
+        self.update_throughput()
+        profiling = self.profile_var.get()
+        reconciling = self.reconcile_var.get()
+        prometheus = self.prometheus_var.get()
+        if profiling:
+            PROFILER.start()
+            PROFILER.record("ingest", self.ingest_seconds)
+            self.log_msg("🔬 Perfilado activo: los tiempos de la corrida incluyen su costo.")
+
+        # expire_session() puede dejar self.tem en None con la corrida en curso
+        tem = self.tem
 
         def worker():
-            for i, row in self.df.iterrows():
-                serial = str(row["SERIAL"]).strip()
-                codigo = str(row["CODIGO_PUNTO"]).strip() if not pd.isna(row["CODIGO_PUNTO"]) else ""
-                try:
-                    if not codigo:
-                        ok = self.tem.create_terminal(serial)
-                        self.log_msg(f"{'✅' if ok else '❌'} Creado: {serial}")
-                    else:
-                        ok = self.tem.modify_terminal(serial, codigo)
-                        self.log_msg(f"{'🟡' if ok else '❌'} Modificado: {serial} → {codigo}")
-                except Exception as e:
-                    self.log_msg(f"❌ Error con {serial}: {e}")
-                # Actualizar barra de progreso en GUI
-                self.progress["value"] = ((i + 1) / total) * 100
-                self.root.update_idletasks()
-
-            self.log_msg("🎯 Procesamiento finalizado.")
-            self.start_btn.config(state="normal")
+            try:
+                done = journal.done_count()
+                if done:
+                    self.log_msg(f"♻️ Reanudando: {done} filas ya completadas se omiten.")
+
+                self.log_msg("🔎 Precargando terminales de la carpeta Migración...")
+                count = tem.prefetch_index(max_workers=max_workers, snapshot_path=SNAPSHOT_PATH)
+                self.log_msg(f"📇 Índice cargado ({count} terminales).")
+
+                def describe(serial, codigo, result):
+                    if isinstance(result, Exception):
+                        return "error", f"❌ Error con {serial}: {result}"
+                    if not result["ok"]:
+                        return "error", f"❌ {result['action'].capitalize()} falló: {serial} ({result['status']})"
+                    if result["status"] == "UNCHANGED":
+                        return "unchanged", f"⏭️ Sin cambios: {serial}"
+                    if result["action"] == "CREATE":
+                        return "created", f"✅ Creado: {serial}"
+                    return "updated", f"🟡 Modificado: {serial} → {codigo or serial}"
+
+                # SERIAL/CODIGO_PUNTO ya vienen normalizados por prepare_dataframe
+                pending = ((i, serial, codigo)
+                           for i, serial, codigo in zip(self.df.index, self.df["SERIAL"], self.df["CODIGO_PUNTO"])
+                           if not journal.is_done(i + 2))
+                # Búsqueda y validación de las próximas filas corren por delante del PUT
+                pipeline = terminal_pipeline(tem, max_workers)
+                for n, ((i, serial, codigo), result) in enumerate(pipeline.run(pending), start=done):
+                    if not isinstance(result, Exception):
+                        journal.record(i + 2, serial, result["action"], result["id"], result["status"])
+                    kind, msg = describe(serial, codigo, result)
+                    METRICS.row_done()
+                    self.events.put(("count", kind))
+                    self.log_msg(msg)
+                    # La barra se actualiza en el próximo drain_events (no desde este hilo)
+                    self.events.put(("progress", ((n + 1) / total) * 100))
+
+                self.log_msg(f"🧵 Etapas: {pipeline.format_stats()}")
+                if reconciling:
+                    self.reconcile_run(tem, journal, max_workers)
+                if profiling:
+                    path = PROFILER.report()
+                    for line in PROFILER.summary_lines():
+                        self.log_msg(f"🔬 {line}")
+                    self.log_msg(f"🔬 Reporte de perfilado: {path}")
+                self.log_msg("🎯 Procesamiento finalizado.")
+                sm = self.session_manager
+                if sm is not None:
+                    stats = sm.connection_stats()
+                    self.log_msg(f"🔌 Conexiones: {stats['connections']} abiertas para {stats['requests']} "
+                                 f"peticiones ({stats['reuse_ratio']:.0%} reutilizadas).")
+                for line in METRICS.format_summary().splitlines():
+                    self.log_msg(f"📈 {line.strip()}")
+                if prometheus:
+                    path = os.path.join("logs", "metrics.prom")
+                    METRICS.write_prometheus(path)
+                    self.log_msg(f"📈 Métricas Prometheus: {path}")
+            except Exception as e:
+                logging.exception("Error en el procesamiento")
+                self.log_msg(f"❌ Procesamiento interrumpido: {e}")
+            finally:
+                # Pase lo que pase: cerrar el journal, apagar el perfilado y liberar la GUI
+                journal.close()
+                if profiling:
+                    PROFILER.stop()
+                self.processing = False
+                self.ui(self.finish_processing)
 
         # Ejecutar worker en hilo separado para no bloquear la GUI
         threading.Thread(target=worker, daemon=True).start()
 
+    def open_journal(self):
+        """
+        Journal del Excel cargado (mismo contenido → mismo journal). Si ya
+        tiene filas completadas se pregunta: reanudar las omite; empezar de
+        cero archiva el journal anterior. Devuelve None si se cancela.
+        """
+        try:
+            journal = CheckpointJournal.for_input(self.df_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"No se pudo abrir el journal de la corrida: {e}")
+            return None
+        done = journal.done_count()
+        if not done:
+            return journal
+
+        answer = messagebox.askyesnocancel(
+            "Corrida anterior",
+            f"¿Reanudar {done} filas ya procesadas de este archivo?\n\n"
+            "Sí: se omiten.\nNo: empezar de cero (el journal anterior se archiva)."
+        )
+        if answer is None:
+            journal.close()
+            return None
+        if answer is False:
+            try:
+                archived = journal.rotate()
+            except OSError as e:
+                journal.close()
+                messagebox.showerror("Error", f"No se pudo archivar el journal anterior: {e}")
+                return None
+            self.log_msg(f"🗂️ Empezando de cero; journal anterior archivado en {archived}")
+        return journal
+
+    def finish_processing(self):
+        """Vuelve a habilitar la ejecución (si la sesión no expiró durante la corrida)."""
+        if self.tem is not None:
+            self.start_btn.config(state="normal")
+
+    def reconcile_run(self, tem, journal, max_workers):
+        """
+        Descarga un snapshot fresco del TEM, lo cruza con el Excel y el journal
+        y deja <archivo>_conciliacion.xlsx junto al Excel de entrada.
+        """
+        self.log_msg("🔄 Descargando snapshot actualizado para conciliar...")
+        try:
+            export_snapshot(tem, SNAPSHOT_PATH, max_workers=max_workers)
+        except Exception as e:
+            # Conciliar contra el índice de la corrida solo confirmaría lo que ella misma escribió
+            self.log_msg(f"⚠️ No se pudo descargar el snapshot ({e}); conciliación omitida.")
+            return
+
+        try:
+            with Snapshot(SNAPSHOT_PATH) as snap:
+                rec = reconcile(self.df, journal.entries(), snap, self.df_invalid)
+            path = write_report(rec, f"{os.path.splitext(self.df_path)[0]}_conciliacion.xlsx")
+        except Exception as e:
+            self.log_msg(f"❌ Error en la conciliación: {e}")
+            return
+        counts = ", ".join(f"{k}: {v}" for k, v in summary(rec).items())
+        self.log_msg(f"📑 Conciliación ({counts}) → {path}")
+
 
 if __name__ == "__main__":
     root = tk.Tk()
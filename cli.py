@@ -0,0 +1,123 @@
+import argparse
+import getpass
+import logging
+import os
+
+from core.engine import DEFAULT_MAX_WORKERS
+from core.jobs import (JobStore, Scheduler, format_jobs, DEFAULT_BUDGET, DEFAULT_CONCURRENT_JOBS,
+                       DEFAULT_PRIORITY, INBOX_DIR)
+from core.snapshot import SNAPSHOT_PATH
+from core.sharded_runner import run_sharded, DEFAULT_PROCESSES
+from core.worker import DELETE_BATCH_SIZE
+
+logging.basicConfig(level=logging.INFO)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Automatización TEM sin interfaz gráfica")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Procesa un Excel/CSV repartido en varios procesos")
+    run.add_argument("input", help="Archivo .xlsx o .csv con SERIAL y CODIGO_PUNTO")
+    run.add_argument("-o", "--output", help="Excel anotado de salida (por defecto <input>_resultado.xlsx)")
+    run.add_argument("-u", "--user", required=True, help="Usuario del TEM")
+    run.add_argument("-p", "--processes", type=int, default=DEFAULT_PROCESSES,
+                     help="Procesos en paralelo (shards por hash de serial)")
+    run.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                     help="Máximo de peticiones/s al TEM sumando todos los procesos")
+    run.add_argument("-w", "--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                     help="Peticiones simultáneas por proceso")
+    run.add_argument("--delete-batch-size", type=int, default=DELETE_BATCH_SIZE)
+    run.add_argument("--profile", action="store_true",
+                     help="Perfilar CPU/memoria por etapa (reporte y stacks para flamegraph por shard)")
+    run.add_argument("--prometheus", action="store_true",
+                     help="Exportar las métricas de cada shard en formato Prometheus (metrics_k.prom)")
+
+    export = sub.add_parser("export", help="Descarga la carpeta Migración a un snapshot local")
+    export.add_argument("-u", "--user", required=True, help="Usuario del TEM")
+    export.add_argument("-o", "--output", default=SNAPSHOT_PATH, help="Archivo del snapshot")
+    export.add_argument("-w", "--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Páginas pedidas en paralelo")
+    export.add_argument("--csv", help="Además, volcar el snapshot a este CSV")
+
+    submit = sub.add_parser("submit", help="Encola un Excel/CSV para el scheduler")
+    submit.add_argument("input", help="Archivo .xlsx o .csv con SERIAL y CODIGO_PUNTO")
+    submit.add_argument("-P", "--priority", type=int, default=DEFAULT_PRIORITY,
+                        help="Mayor número = se ejecuta antes")
+    submit.add_argument("--operator", default=os.environ.get("USER") or os.environ.get("USERNAME"))
+    submit.add_argument("-o", "--output", help="Excel anotado de salida")
+    submit.add_argument("--resume", metavar="JOB_ID",
+                        help="Continuar un trabajo anterior: se omiten las filas que ya terminaron bien")
+
+    sub.add_parser("jobs", help="Lista los trabajos y su estado")
+
+    cancel = sub.add_parser("cancel", help="Cancela un trabajo en cola o en curso")
+    cancel.add_argument("job_id")
+
+    scheduler = sub.add_parser("scheduler", help="Ejecuta los trabajos en cola con un login compartido")
+    scheduler.add_argument("-u", "--user", required=True, help="Usuario del TEM")
+    scheduler.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                           help="Máximo de peticiones/s al TEM sumando todos los trabajos")
+    scheduler.add_argument("-j", "--jobs", type=int, default=DEFAULT_CONCURRENT_JOBS,
+                           help="Trabajos simultáneos")
+    scheduler.add_argument("-w", "--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                           help="Peticiones simultáneas por trabajo")
+    scheduler.add_argument("--inbox", default=INBOX_DIR, help="Carpeta donde los operadores dejan archivos")
+    scheduler.add_argument("--poll", type=float, default=5.0, help="Segundos entre revisiones de la cola")
+    scheduler.add_argument("--once", action="store_true", help="Terminar cuando la cola quede vacía")
+    return parser
+
+
+def export_folder(args, password):
+    import csv
+    from core.session_manager import SessionManager
+    from core.snapshot import Snapshot, export_snapshot
+    from core.tem_automation import TEMAutomation
+
+    sm = SessionManager()
+    ok, msg = sm.login(args.user, password)
+    if not ok:
+        raise SystemExit(msg)
+    rows = export_snapshot(TEMAutomation(sm), args.output, max_workers=args.workers)
+    print(f"Snapshot: {rows} terminales → {args.output}")
+
+    if args.csv:
+        with Snapshot(args.output) as snap, open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["id", "signature", "name", "type"])
+            writer.writeheader()
+            writer.writerows(snap)
+        print(f"CSV: {args.csv}")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "submit":
+        job = JobStore().submit(args.input, args.priority, args.operator, args.output, resume=args.resume)
+        print(f"Trabajo {job['id']} en cola (prioridad {job['priority']})")
+        return
+    if args.command == "jobs":
+        print(format_jobs(JobStore().all()))
+        return
+    if args.command == "cancel":
+        print("Cancelado" if JobStore().cancel(args.job_id) else "No hay un trabajo activo con ese ID")
+        return
+
+    # La contraseña nunca va en la línea de comandos
+    password = os.environ.get("TEM_PASSWORD") or getpass.getpass("Contraseña TEM: ")
+
+    if args.command == "run":
+        output = args.output or f"{os.path.splitext(args.input)[0]}_resultado.xlsx"
+        run_sharded(args.input, output, args.user, password,
+                    processes=args.processes, max_workers=args.workers,
+                    delete_batch_size=args.delete_batch_size, profile=args.profile, budget=args.budget,
+                    prometheus=args.prometheus)
+    elif args.command == "export":
+        export_folder(args, password)
+    elif args.command == "scheduler":
+        Scheduler(JobStore(), args.user, password, budget=args.budget, concurrent_jobs=args.jobs,
+                  max_workers=args.workers, inbox=args.inbox).run(poll=args.poll, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# conftest.py
+# Raíz del repo en sys.path para que los tests importen core/ y tools/ como en la app
@@ -0,0 +1,197 @@
+# core/action_log.py
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+
+from .profiling import stage
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOG_DIR = "logs"
+TEXT_LOG_PATH = os.path.join(LOG_DIR, "automation_log.txt")
+JSONL_LOG_PATH = os.path.join(LOG_DIR, "automation_log.jsonl")
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+RETRY_INTERVAL = 2.0        # segundos entre reintentos de un lote que no se pudo escribir
+MAX_PENDING = 100_000       # registros retenidos por destino mientras el disco falla
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class FileLock:
+    """
+    Lock entre procesos sobre un archivo '.lock' al lado de `path` (el log,
+    el JSON de un trabajo). Lo libera el sistema si el proceso muere.
+    """
+
+    def __init__(self, path: str):
+        self.path = f"{path}.lock"
+
+    def __enter__(self):
+        self._fh = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        else:
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        else:
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        self._fh.close()
+
+
+def _rotate(path: str, backups: int):
+    """automation_log.txt → .1 → .2 ... (se descarta el más viejo)."""
+    for i in range(backups - 1, 0, -1):
+        src = f"{path}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def _append(path: str, data: str, max_bytes: int, backups: int):
+    with FileLock(path):
+        if max_bytes and os.path.exists(path) and os.path.getsize(path) + len(data) > max_bytes:
+            _rotate(path, backups)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+
+class ActionLogger:
+    """
+    Bitácora de acciones (CHECK_EXIST, CREATE, UPDATE...) con escritor en segundo plano.
+
+    Los hilos solo encolan; un hilo escritor agrupa los eventos y los escribe
+    por lotes en el formato de texto de siempre y en JSONL, con rotación por
+    tamaño y un lock de archivo para que varios procesos compartan el log.
+
+    Si un destino falla (disco lleno, archivo bloqueado) sus registros se
+    retienen, en orden, y se reintentan con el lote siguiente o cada
+    RETRY_INTERVAL segundos; los del otro destino no se repiten.
+    """
+
+    def __init__(self, text_path: str = TEXT_LOG_PATH, jsonl_path: str = JSONL_LOG_PATH,
+                 max_bytes: int = MAX_BYTES, backups: int = BACKUP_COUNT,
+                 flush_interval: float = 0.5, batch_size: int = 1000):
+        self.text_path = text_path
+        self.jsonl_path = jsonl_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        for path in (text_path, jsonl_path):
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._queue = queue.Queue()
+        # Destino → registros que aún no se pudieron escribir
+        self._pending = {path: [] for path in (text_path, jsonl_path) if path}
+        self._thread = threading.Thread(target=self._run, name="action-log", daemon=True)
+        self._thread.start()
+
+    def log(self, action, serial, status, detail=""):
+        self._queue.put({
+            "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "action": str(action).upper(),
+            "serial": serial,
+            "status": status,
+            "detail": detail
+        })
+
+    def flush(self):
+        """Bloquea hasta que todo lo encolado quede escrito en disco."""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            retry = any(self._pending.values())
+            try:
+                item = self._queue.get(timeout=RETRY_INTERVAL if retry else None)
+            except queue.Empty:
+                self._write([])  # sin eventos nuevos: reintentar lo pendiente
+                continue
+            batch = [item]
+            # Juntar lo que llegue durante flush_interval (o hasta batch_size)
+            while item is not _STOP and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            records = [r for r in batch if r is not _STOP]
+            try:
+                if records:
+                    with stage("log"):
+                        self._write(records)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) != len(batch):
+                if any(self._pending.values()):
+                    self._write([])  # último intento antes de cerrar
+                lost = sum(len(p) for p in self._pending.values())
+                if lost:
+                    logger.error("Log de acciones: %d registros no se pudieron escribir al cerrar", lost)
+                return
+
+    def _format(self, path, records) -> str:
+        if path == self.text_path:
+            return "".join(
+                f"[{r['ts']}] {r['action']} | {r['serial']} | {r['status']} | {r['detail']}\n"
+                for r in records
+            )
+        return "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+
+    def _write(self, records):
+        """Escribe cada destino por separado; lo que falla queda pendiente para el próximo intento."""
+        for path, pending in self._pending.items():
+            pending.extend(records)
+            if not pending:
+                continue
+            try:
+                _append(path, self._format(path, pending), self.max_bytes, self.backups)
+            except Exception:
+                if len(pending) > MAX_PENDING:
+                    logger.error("Log de acciones %s: se descartan %d registros viejos", path,
+                                 len(pending) - MAX_PENDING)
+                    del pending[:len(pending) - MAX_PENDING]
+                logger.warning("No se pudo escribir el log de acciones %s (%d registros pendientes)",
+                               path, len(pending), exc_info=True)
+            else:
+                pending.clear()
+
+
+_default_logger = None
+_default_lock = threading.Lock()
+
+
+def get_action_logger() -> ActionLogger:
+    """Logger compartido por el proceso; se vacía automáticamente al salir."""
+    global _default_logger
+    with _default_lock:
+        if _default_logger is None:
+            _default_logger = ActionLogger()
+            atexit.register(_default_logger.close)
+        return _default_logger
@@ -1,34 +1,63 @@
 # core/api_client.py
 import requests
-
-BASE = "https://estate-manager-nar03.icloud.ingenico.com/emgui/rest/dms/terminals"
+from .endpoints import SAVE_OR_UPDATE_URL, DELETE_TERMINALS_URL, auth_headers, dumps, encode_delete
+from .metrics import endpoint_name
+from .rate_limiter import request_with_retry
+from .session_manager import request_with_reauth
 
 class APIClient:
-    def __init__(self, session: requests.Session, csrf_token: str):
+    def __init__(self, session: requests.Session, csrf_token: str, rate_limiter=None, max_retries=3,
+                 session_manager=None):
         self.session = session
+        # Opcional: permite re-autenticar automáticamente si la sesión expira
+        self.session_manager = session_manager
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
         self.csrf_token = csrf_token
-        self.headers = {
-            "accept": "application/json, text/plain, */*",
-            "content-type": "application/json",
-            "x-csrf-token": self.csrf_token,
-            "x-encode-html-entities": "false"
-        }
+        self.headers = auth_headers(csrf_token)
+        # Formato aceptado por deleteTerminals ("list" o "ids"); se detecta una sola vez
+        self.delete_format = None
+
+    def _request(self, method: str, url: str, **kwargs):
+        """Toda llamada pasa por el limiter compartido (ritmo adaptativo + reintentos)."""
+        return request_with_reauth(
+            self.session_manager,
+            lambda: request_with_retry(
+                lambda: self.session.request(method, url, headers=self.headers, **kwargs),
+                self.rate_limiter, self.max_retries, endpoint_name(url)
+            ),
+            self._sync_auth
+        )
 
-    def save_or_update(self, payload: dict, timeout=30):
-        url = f"{BASE}/saveOrUpdateTerminal/"
-        return self.session.put(url, json=payload, headers=self.headers, timeout=timeout)
+    def _sync_auth(self):
+        self.csrf_token = self.session_manager.get_csrf()
+        self.headers = auth_headers(self.csrf_token)
+
+    def save_or_update(self, payload, timeout=30):
+        """`payload` puede ser el dict o el cuerpo ya serializado (endpoints.encode_terminal)."""
+        body = payload if isinstance(payload, bytes) else dumps(payload)
+        return self._request("PUT", SAVE_OR_UPDATE_URL, data=body, timeout=timeout)
 
     def delete_terminals(self, ids: list, timeout=30):
-        """Elimina terminales usando el formato que acepta el TEM."""
-        url = f"{BASE}/deleteTerminals/?fullGws=false"
+        """
+        Elimina terminales usando el formato que acepta el TEM.
+        Algunos entornos requieren lista, otros {"ids": [...]}: el formato se
+        prueba solo hasta el primer borrado exitoso y luego se reutiliza.
+        """
+        url = DELETE_TERMINALS_URL
         try:
-            # algunos entornos requieren lista, otros {"ids": [...]}
-            resp = self.session.post(url, json=ids, headers=self.headers, timeout=timeout)
-            if not resp.ok:
-                # segundo intento con formato alternativo
-                alt = self.session.post(url, json={"ids": ids}, headers=self.headers, timeout=timeout)
-                return alt
-            return resp
+            if self.delete_format:
+                return self._request("POST", url, data=encode_delete(ids, self.delete_format), timeout=timeout)
+
+            resp = self._request("POST", url, data=encode_delete(ids, "list"), timeout=timeout)
+            if resp.ok:
+                self.delete_format = "list"
+                return resp
+            # segundo intento con formato alternativo
+            alt = self._request("POST", url, data=encode_delete(ids, "ids"), timeout=timeout)
+            if alt.ok:
+                self.delete_format = "ids"
+            return alt
         except Exception as e:
             print("Error en delete_terminals:", e)
             raise
@@ -0,0 +1,169 @@
+# core/async_client.py
+import asyncio
+import json
+
+try:
+    import aiohttp
+except ImportError:  # dependencia opcional: solo se necesita para el cliente async
+    aiohttp = None
+
+from .endpoints import TERMINALS_URL, auth_headers, dumps, encode_delete, search_payload
+from .metrics import METRICS, endpoint_name
+from .rate_limiter import arequest_with_retry
+from .session_manager import is_auth_failure
+
+
+class AsyncResponse:
+    """Respuesta ya leída, con la misma forma básica que requests.Response."""
+
+    def __init__(self, status_code: int, text: str, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = dict(headers or {})
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncAPIClient:
+    """
+    Cliente asyncio del TEM (aiohttp). Reutiliza las cookies y el token CSRF
+    obtenidos por SessionManager.login, así miles de peticiones pueden estar
+    en vuelo en un solo hilo.
+
+    Como APIClient, cada petición pasa por el limiter compartido (ritmo
+    adaptativo + reintentos), queda en las métricas de la corrida y, con
+    `session_manager`, se re-autentica una vez si el TEM rechaza la sesión.
+
+    Uso:
+        async with AsyncAPIClient.from_session_manager(sm) as client:
+            resps = await asyncio.gather(*(client.save_or_update(p) for p in payloads))
+    """
+
+    def __init__(self, cookies: dict, csrf_token: str, base_url: str = TERMINALS_URL,
+                 max_concurrency: int = 100, timeout: float = 30, rate_limiter=None,
+                 max_retries: int = 3, session_manager=None, metrics=METRICS, delete_format: str = None):
+        if aiohttp is None:
+            raise RuntimeError("El cliente async requiere 'aiohttp' (pip install aiohttp)")
+        self.base_url = base_url.rstrip("/")
+        self.cookies = dict(cookies)
+        self.csrf_token = csrf_token
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.session_manager = session_manager
+        self.metrics = metrics
+        self.headers = auth_headers(csrf_token)
+        # Como APIClient.delete_format: se detecta una vez (o se recibe ya detectado)
+        self.delete_format = delete_format
+        self._session = None
+        self._semaphore = None
+
+    @classmethod
+    def from_session_manager(cls, session_manager, **kwargs):
+        """Crea el cliente a partir de una sesión ya autenticada con Playwright."""
+        cookies = {c.name: c.value for c in session_manager.get_session().cookies}
+        kwargs.setdefault("session_manager", session_manager)
+        return cls(cookies, session_manager.get_csrf(), **kwargs)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                cookies=self.cookies,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _send(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        async with self._semaphore:
+            # Los headers se leen en cada intento: tras re-autenticar llevan el CSRF nuevo
+            async with self._session.request(method, url, headers=self.headers, **kwargs) as resp:
+                text = await resp.text()
+                return AsyncResponse(resp.status, text, resp.headers)
+
+    async def _request(self, method: str, path: str, **kwargs) -> AsyncResponse:
+        if self._session is None:
+            await self.open()
+        url = f"{self.base_url}/{path}"
+
+        def attempt():
+            return arequest_with_retry(
+                lambda: self._send(method, url, **kwargs), self.rate_limiter, self.max_retries,
+                endpoint_name(url), self.metrics, (aiohttp.ClientError, asyncio.TimeoutError)
+            )
+
+        sm = self.session_manager
+        if sm is None:
+            return await attempt()
+        generation = sm.generation
+        resp = await attempt()
+        # El login es bloqueante (requests/Playwright): se hace en un hilo aparte
+        if not is_auth_failure(resp) or not await asyncio.to_thread(sm.refresh, generation):
+            return resp
+        self._sync_auth()
+        return await attempt()
+
+    def _sync_auth(self):
+        """Toma el CSRF y las cookies renovadas por el SessionManager."""
+        self.csrf_token = self.session_manager.get_csrf()
+        self.headers = auth_headers(self.csrf_token)
+        self.cookies = {c.name: c.value for c in self.session_manager.get_session().cookies}
+        if self._session is not None:
+            self._session.cookie_jar.update_cookies(self.cookies)
+
+    # ==========================================================
+    # 🔌 OPERACIONES DEL TEM
+    # ==========================================================
+    async def save_or_update(self, payload) -> AsyncResponse:
+        """Como APIClient.save_or_update: acepta el dict o el cuerpo ya serializado."""
+        body = payload if isinstance(payload, bytes) else dumps(payload)
+        return await self._request("PUT", "saveOrUpdateTerminal/", data=body)
+
+    async def delete_terminals(self, ids: list) -> AsyncResponse:
+        """
+        Igual que APIClient: primero lista, si falla {"ids": [...]}, solo hasta
+        el primer borrado exitoso. Con el formato ya conocido un error del TEM
+        se devuelve tal cual, sin repetir el lote en el otro formato.
+        """
+        path = "deleteTerminals/?fullGws=false"
+        if self.delete_format:
+            return await self._request("POST", path, data=encode_delete(ids, self.delete_format))
+
+        resp = await self._request("POST", path, data=encode_delete(ids, "list"))
+        if resp.ok:
+            self.delete_format = "list"
+            return resp
+        alt = await self._request("POST", path, data=encode_delete(ids, "ids"))
+        if alt.ok:
+            self.delete_format = "ids"
+        return alt
+
+    async def search_terminals(self, serial: str = None, start: int = 0, length: int = 100) -> AsyncResponse:
+        """Busca en 'Migración' (terminalLights); sin serial lista la carpeta paginada."""
+        criteria = [{"key": {"header": "SIGNATURE"}, "value": serial}] if serial else []
+        return await self._request(
+            "POST", f"terminalLights/?full=false&length={length}&start={start}",
+            json=search_payload(*criteria)
+        )
+
+    async def validate_signature(self, serial: str) -> AsyncResponse:
+        return await self._request("GET", "validateTerminalSignature/", params={"signature": serial})
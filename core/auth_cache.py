@@ -0,0 +1,70 @@
+# core/auth_cache.py
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".tem_automation")
+# Vida máxima del caché; igual se valida contra /rest/home/context antes de usarlo
+DEFAULT_TTL = 8 * 3600
+
+
+def cache_path(username: str, directory: str = CACHE_DIR) -> str:
+    """Un archivo por usuario; el nombre es un hash para no exponer el usuario."""
+    key = hashlib.sha256(username.strip().lower().encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"auth_{key}.json")
+
+
+def save_auth_state(path: str, cookies: list, csrf_token: str, ttl: int = DEFAULT_TTL):
+    """
+    Guarda cookies + CSRF con su vencimiento. `cookies` usa el formato de
+    Playwright ({name, value, domain, path, expires}).
+
+    El archivo contiene la sesión del usuario y nada de su contraseña: lo
+    protegen los permisos de su perfil (CACHE_DIR está bajo ~). En Windows
+    eso es el ACL del perfil; en POSIX además se crea con permisos 0600.
+    """
+    expires_at = time.time() + ttl
+    # Si alguna cookie persistente vence antes, manda esa fecha
+    for c in cookies:
+        if c.get("expires") and c["expires"] > 0:
+            expires_at = min(expires_at, c["expires"])
+
+    state = {
+        "cookies": [
+            {k: c.get(k) for k in ("name", "value", "domain", "path", "expires")}
+            for c in cookies
+        ],
+        "csrf_token": csrf_token,
+        "saved_at": time.time(),
+        "expires_at": expires_at
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def load_auth_state(path: str):
+    """Devuelve el estado guardado o None si no existe, está dañado o ya venció."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if "verifier" in state:
+        # Formato anterior con un hash de la contraseña: se borra del disco
+        clear_auth_state(path)
+        return None
+    if not state.get("cookies") or state.get("expires_at", 0) <= time.time():
+        return None
+    return state
+
+
+def clear_auth_state(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
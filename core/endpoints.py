@@ -0,0 +1,150 @@
+# core/endpoints.py
+"""
+Capa única de endpoints del TEM: URLs, headers y cuerpos de petición.
+
+Todo se arma una sola vez al importar (TEM_BASE_URL elige el ambiente) y
+lo comparten TEMAutomation, APIClient, AsyncAPIClient y SessionManager.
+"""
+import json
+import os
+from types import MappingProxyType
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa json de la librería estándar
+    orjson = None
+
+# TEM_BASE_URL permite apuntar a otro ambiente (ej. el mock local de tools/mock_tem_server.py)
+BASE = os.environ.get("TEM_BASE_URL", "https://estate-manager-nar03.icloud.ingenico.com").rstrip("/")
+LOGIN_URL = f"{BASE}/emgui/"
+CONTEXT_URL = f"{BASE}/emgui/rest/home/context"
+
+TERMINALS_URL = f"{BASE}/emgui/rest/dms/terminals"
+TERMINAL_LIGHTS_URL = f"{TERMINALS_URL}/terminalLights/"
+VALIDATE_SIGNATURE_URL = f"{TERMINALS_URL}/validateTerminalSignature/"
+SAVE_OR_UPDATE_URL = f"{TERMINALS_URL}/saveOrUpdateTerminal/"
+DELETE_TERMINALS_URL = f"{TERMINALS_URL}/deleteTerminals/?fullGws=false"
+
+MIGRACION_PARENT_ID = "2a2c6a55:19875777b4c:-3daa:AC1A2373"
+TERMINAL_TYPE = "AXIUMNX"
+
+BASE_HEADERS = MappingProxyType({
+    "accept": "application/json, text/plain, */*",
+    "content-type": "application/json",
+    "x-encode-html-entities": "false"
+})
+
+
+def dumps(value) -> bytes:
+    """JSON compacto en UTF-8 (orjson si está instalado)."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def auth_headers(csrf_token: str):
+    """Headers de solo lectura para un token; se arman al autenticar, no por petición."""
+    return MappingProxyType({**BASE_HEADERS, "x-csrf-token": csrf_token})
+
+
+def terminal_lights_url(start: int = 0, length: int = 100) -> str:
+    return f"{TERMINAL_LIGHTS_URL}?full=false&length={length}&start={start}"
+
+
+# ==========================================================
+# 🔍 terminalLights (búsqueda en la carpeta Migración)
+# ==========================================================
+def search_payload(*criteria) -> dict:
+    """Arma el cuerpo de terminalLights filtrando por la carpeta 'Migración'."""
+    return {
+        "sortColumns": [{"key": {"header": "NAME"}, "value": True}],
+        "criteriaAndList": [
+            *criteria,
+            {"key": {"header": "PARENT_ID"}, "value": MIGRACION_PARENT_ID},
+            {"key": {"header": "CATEGORY"}, "value": 1}
+        ],
+        "criteriaOrLists": [],
+        "geoLocationSearch": None,
+        "displayedColumns": [
+            {"header": "NAME"},
+            {"header": "SIGNATURE"},
+            {"header": "TYPE"}
+        ]
+    }
+
+
+_FOLDER_SEARCH = dumps(search_payload())
+
+
+def encode_search(serial: str = None) -> bytes:
+    """Cuerpo ya serializado de terminalLights; sin serial es siempre el mismo."""
+    if serial is None:
+        return _FOLDER_SEARCH
+    return dumps(search_payload({"key": {"header": "SIGNATURE"}, "value": serial}))
+
+
+# ==========================================================
+# 🗑️ deleteTerminals
+# ==========================================================
+# Según el ambiente deleteTerminals acepta una lista simple o {"ids": [...]};
+# los clientes prueban en este orden y recuerdan el primero que funciona
+DELETE_FORMATS = ("list", "ids")
+
+
+def encode_delete(ids: list, fmt: str = "list") -> bytes:
+    """Cuerpo serializado de deleteTerminals en el formato `fmt` (ver DELETE_FORMATS)."""
+    return dumps(ids if fmt == "list" else {"ids": ids})
+
+
+# ==========================================================
+# 💾 saveOrUpdateTerminal
+# ==========================================================
+def terminal_payload(serial: str, name: str = None, term_id=None) -> dict:
+    """Cuerpo de saveOrUpdateTerminal como dict (para inspección y clientes que serializan)."""
+    return {
+        "terminalAndGeolocation": {
+            "id": term_id or None,
+            "signature": serial,
+            "name": name or serial,
+            "description": "",
+            "status": 0,
+            "type": TERMINAL_TYPE,
+            "category": 1,
+            "parentId": MIGRACION_PARENT_ID,  # Carpeta Migración
+            "merchantId": None,
+            "geoLocation": None,
+            "customValues": {},
+            "automaticSwap": False
+        },
+        "tagIds": None,
+        "callSchedule": None,
+        "blockData": None,
+        "attachData": None,
+        "ipRange": None,
+        "wipeRequest": False
+    }
+
+
+def _split_template():
+    """
+    Serializa una vez la plantilla con marcadores y la corta en sus partes
+    fijas: por petición solo se codifican id, signature y name.
+    """
+    marks = ("\x00id\x00", "\x00sig\x00", "\x00name\x00")
+    raw = dumps(terminal_payload(marks[1], marks[2], marks[0]))
+    parts = []
+    for mark in marks:
+        encoded = dumps(mark)
+        head, raw = raw.split(encoded, 1)
+        parts.append(head)
+    parts.append(raw)
+    return tuple(parts)
+
+
+_PUT_PARTS = _split_template()
+
+
+def encode_terminal(serial: str, name: str = None, term_id=None) -> bytes:
+    """Cuerpo serializado de saveOrUpdateTerminal; equivale a dumps(terminal_payload(...))."""
+    p = _PUT_PARTS
+    return b"".join((p[0], dumps(term_id or None), p[1], dumps(serial), p[2], dumps(name or serial), p[3]))
@@ -0,0 +1,38 @@
+# core/engine.py
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def imap_ordered(func, items, max_workers: int = DEFAULT_MAX_WORKERS, max_pending: int = None):
+    """
+    Ejecuta func(item) con un pool acotado de hilos y entrega los resultados
+    en el mismo orden de entrada.
+
+    - max_workers: cantidad máxima de peticiones simultáneas al TEM.
+    - max_pending: filas encoladas por adelantado (por defecto 2 × max_workers),
+      así no se envían al pool miles de tareas de una vez.
+
+    Todos los hilos comparten el mismo requests.Session (cookies + CSRF).
+    """
+    max_workers = max(1, int(max_workers))
+    if max_workers == 1:
+        for item in items:
+            yield func(item)
+        return
+
+    max_pending = max(max_workers, max_pending or max_workers * 2)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tem-worker") as pool:
+        try:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Si el consumidor se detiene antes, no seguir enviando filas pendientes
+            for fut in pending:
+                fut.cancel()
@@ -1,11 +1,152 @@
 # core/excel_processor.py
+import codecs
+import csv
+import os
 import pandas as pd
 
+REQUIRED_COLUMNS = {"SERIAL", "CODIGO_PUNTO"}
+CSV_EXTENSIONS = (".csv", ".txt")
+# Excel en configuración regional española exporta con ";" y en cp1252
+CSV_DELIMITERS = ",;\t|"
+CSV_ENCODINGS = ("utf-8-sig", "cp1252")
+SNIFF_CHARS = 64 * 1024
+
+
 def read_excel(path: str):
     """Lee un archivo Excel con las columnas SERIAL y CODIGO_PUNTO."""
     df = pd.read_excel(path)
     df.columns = [c.strip().upper() for c in df.columns]
-    required = {"SERIAL", "CODIGO_PUNTO"}
+    required = REQUIRED_COLUMNS
     if not required.issubset(df.columns):
         raise ValueError(f"El Excel debe tener las columnas: {required}")
     return df
+
+
+def clean_codigo_punto(value):
+    """
+    Limpia y formatea el código de punto:
+    - Convierte floats (ej. 1234.0 → "1234")
+    - Maneja valores vacíos, nulos o 'nan'
+    """
+    if value is None:
+        return ""
+    try:
+        if isinstance(value, float):
+            if value != value:  # NaN de pandas
+                return ""
+            if value.is_integer():
+                return str(int(value))
+            return str(value)
+        value_str = str(value).strip()
+        if value_str.lower() in ("nan", "none", ""):
+            return ""
+        if value_str.endswith(".0"):
+            # Si viene de Excel como texto tipo "1234.0"
+            value_str = value_str[:-2]
+        return value_str
+    except Exception:
+        return str(value)
+
+
+def normalize_record(raw: dict, row: int) -> dict:
+    """
+    Convierte una fila cruda (Excel, CSV o DataFrame) en el registro que usa el motor:
+    {"row", "SERIAL", "CODIGO_PUNTO", "action", "id", "error"}.
+    `row` es el número de fila en la hoja (la cabecera es la fila 1).
+    """
+    cells = {str(k).strip().upper(): v for k, v in raw.items() if k is not None}
+    action = clean_codigo_punto(cells.get("ACTION")).lower()
+    delete = action == "delete" or clean_codigo_punto(cells.get("DELETE")).lower() == "yes"
+    record = {
+        "row": row,
+        "SERIAL": clean_codigo_punto(cells.get("SERIAL")),
+        "CODIGO_PUNTO": clean_codigo_punto(cells.get("CODIGO_PUNTO")),
+        "action": "delete" if delete else "upsert",
+        "id": clean_id(cells.get("ID")),
+        "error": None
+    }
+    if not delete and not record["SERIAL"]:
+        record["error"] = "SERIAL vacío"
+    return record
+
+
+def _check_header(header):
+    missing = REQUIRED_COLUMNS - {str(h).strip().upper() for h in header if h is not None}
+    if missing:
+        raise ValueError(f"El archivo debe tener las columnas: {REQUIRED_COLUMNS}")
+
+
+def _csv_encoding(path: str, chunk_size: int = 1 << 20) -> str:
+    """UTF-8 si todo el archivo decodifica como tal (una pasada en bloques); si no, cp1252."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return CSV_ENCODINGS[1]
+    return CSV_ENCODINGS[0]
+
+
+def open_csv(path: str):
+    """
+    Abre un CSV detectando la codificación (UTF-8, con o sin BOM, o cp1252) y
+    el delimitador (csv.Sniffer sobre el comienzo del archivo; "," si no se
+    puede deducir). Devuelve (archivo abierto, csv.reader).
+    """
+    f = open(path, newline="", encoding=_csv_encoding(path))
+    sample = f.read(SNIFF_CHARS)
+    f.seek(0)
+    if len(sample) == SNIFF_CHARS:
+        sample = sample[:sample.rfind("\n") + 1] or sample  # solo líneas completas
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel
+    return f, csv.reader(f, dialect)
+
+
+def iter_records(path: str):
+    """
+    Lee el archivo en streaming (openpyxl read-only o CSV) y entrega los
+    registros normalizados uno a uno, sin cargar la hoja completa en memoria.
+    Las filas totalmente vacías se omiten. Los CSV pueden venir con ";" y en
+    cp1252 (ver open_csv).
+    """
+    if os.path.splitext(path)[1].lower() in CSV_EXTENSIONS:
+        f, reader = open_csv(path)
+        with f:
+            header = next(reader, [])
+            _check_header(header)
+            for row, values in enumerate(reader, start=2):
+                if any(v.strip() for v in values):
+                    yield normalize_record(dict(zip(header, values)), row)
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        _check_header(header)
+        for row, values in enumerate(rows, start=2):
+            if any(v is not None and str(v).strip() for v in values):
+                yield normalize_record(dict(zip(header, values)), row)
+    finally:
+        wb.close()
+
+
+def dataframe_records(df):
+    """Registros normalizados de un DataFrame ya cargado (sin crear una Series por fila)."""
+    columns = list(df.columns)
+    for pos, values in enumerate(df.itertuples(index=False, name=None)):
+        yield normalize_record(dict(zip(columns, values)), pos + 2)
+
+
+def clean_id(value):
+    """ID del TEM de una celda: texto sin espacios, o None si está vacía."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    value = str(value).strip()
+    return value or None
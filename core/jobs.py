@@ -0,0 +1,312 @@
+# core/jobs.py
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from .action_log import FileLock
+from .api_client import APIClient
+from .engine import DEFAULT_MAX_WORKERS
+from .excel_processor import iter_records
+from .journal import CheckpointJournal
+from .rate_limiter import DEFAULT_BUDGET, budget_limiter
+from .session_manager import SessionManager
+from .sharded_runner import merge_results
+from .tem_automation import TEMAutomation
+from .worker import process_records
+
+JOBS_DIR = os.path.join("logs", "jobs")
+INBOX_DIR = os.path.join(JOBS_DIR, "inbox")
+INPUT_EXTENSIONS = (".xlsx", ".xlsm", ".csv")
+
+DEFAULT_PRIORITY = 5
+DEFAULT_CONCURRENT_JOBS = 2
+CANCEL_CHECK_ROWS = 100
+INBOX_MIN_AGE = 10.0        # segundos sin cambios antes de tomar un archivo de la bandeja
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "QUEUED", "RUNNING", "DONE", "FAILED", "CANCELLED"
+
+
+class JobStore:
+    """
+    Estado de los trabajos en disco: un JSON por trabajo en logs/jobs/, escrito
+    de forma atómica. Varios operadores (o procesos) pueden encolar a la vez.
+
+    Los cambios de estado leen y escriben el JSON bajo un lock de archivo por
+    trabajo (<id>.json.lock), así un `cancel` desde otra consola no se pierde
+    entre la lectura y la escritura del scheduler.
+    """
+
+    def __init__(self, directory: str = JOBS_DIR):
+        self.directory = directory
+        self.files_dir = os.path.join(directory, "files")
+        os.makedirs(self.files_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._inbox_seen = {}
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def journal_path(self, job_id: str) -> str:
+        """Journal propio del trabajo: dos trabajos con el mismo Excel no se pisan ni se saltan filas."""
+        return os.path.join(self.directory, f"{job_id}.journal.jsonl")
+
+    def save(self, job: dict) -> dict:
+        with self._lock:
+            tmp = f"{self._path(job['id'])}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(job, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self._path(job["id"]))
+        return job
+
+    def get(self, job_id: str):
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def update(self, job_id: str, expect=None, **fields):
+        """
+        Lee, modifica y guarda el trabajo bajo su lock. Con `expect` (estados)
+        es un compare-and-swap: si el estado actual no está entre ellos no se
+        cambia nada y devuelve None.
+        """
+        with FileLock(self._path(job_id)):
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if expect is not None and job["status"] not in expect:
+                return None
+            job.update(fields)
+            return self.save(job)
+
+    def all(self) -> list:
+        jobs = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                job = self.get(name[:-5])
+                if job:
+                    jobs.append(job)
+        return sorted(jobs, key=lambda j: j["created"])
+
+    def submit(self, input_path: str, priority: int = DEFAULT_PRIORITY, operator: str = None,
+               output_path: str = None, move: bool = False, resume: str = None) -> dict:
+        """
+        Encola un Excel/CSV. El archivo se copia (o mueve, desde la bandeja) a
+        logs/jobs/files para que el trabajo no dependa del original.
+
+        Cada trabajo empieza de cero con su propio journal; con `resume` (ID de
+        un trabajo anterior) arranca con una copia del journal de ese trabajo
+        y se omiten las filas que ya terminaron bien allí.
+        """
+        previous = None
+        if resume:
+            previous = self.journal_path(resume)
+            if self.get(resume) is None or not os.path.exists(previous):
+                raise KeyError(f"No hay journal del trabajo {resume}")
+        job_id = f"{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        name = os.path.basename(input_path)
+        stored = os.path.join(self.files_dir, f"{job_id}_{name}")
+        (shutil.move if move else shutil.copy2)(input_path, stored)
+        if previous:
+            shutil.copy2(previous, self.journal_path(job_id))
+        return self.save({
+            "id": job_id,
+            "input": stored,
+            "source": os.path.abspath(input_path),
+            "output": output_path or f"{os.path.splitext(stored)[0]}_resultado.xlsx",
+            "priority": priority,
+            "operator": operator,
+            "resumed_from": resume,
+            "status": QUEUED,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "rows": 0,
+            "ok": 0,
+            "error": None
+        })
+
+    def cancel(self, job_id: str) -> bool:
+        """Un trabajo en cola no se ejecuta; uno en curso se detiene en el próximo control."""
+        try:
+            return self.update(job_id, expect=(QUEUED, RUNNING), status=CANCELLED, finished=time.time()) is not None
+        except KeyError:
+            return False
+
+    def next_queued(self, exclude=()):
+        """Mayor prioridad primero; a igual prioridad, el más antiguo."""
+        queued = [j for j in self.all() if j["status"] == QUEUED and j["id"] not in exclude]
+        return min(queued, key=lambda j: (-j["priority"], j["created"])) if queued else None
+
+    def scan_inbox(self, inbox: str = INBOX_DIR, priority: int = DEFAULT_PRIORITY,
+                   min_age: float = INBOX_MIN_AGE) -> list:
+        """
+        Encola los archivos dejados en la bandeja (se mueven fuera de ella).
+
+        Un archivo se toma recién cuando tamaño y fecha no cambiaron desde la
+        revisión anterior y lleva `min_age` segundos sin modificarse: una copia
+        lenta (ej. desde una carpeta de red) no se encola a medias. Para que
+        sea inmediato, copiar con otra extensión (.part) y renombrar al final.
+        """
+        os.makedirs(inbox, exist_ok=True)
+        jobs = []
+        seen = {}
+        for name in sorted(os.listdir(inbox)):
+            path = os.path.join(inbox, name)
+            if not (os.path.isfile(path) and name.lower().endswith(INPUT_EXTENSIONS) and not name.startswith("~$")):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen[path] = (st.st_size, st.st_mtime)
+            if self._inbox_seen.get(path) != seen[path] or time.time() - st.st_mtime < min_age:
+                continue
+            try:
+                jobs.append(self.submit(path, priority, move=True))
+            except OSError:
+                continue  # todavía abierto por quien lo copia (Windows): se reintenta en la próxima vuelta
+            del seen[path]
+        self._inbox_seen = seen
+        return jobs
+
+
+class Scheduler:
+    """
+    Ejecuta los trabajos en cola con un solo login y un solo presupuesto de
+    peticiones para todos:
+
+    - un SessionManager (cookies + CSRF + pool de conexiones) compartido por
+      todos los APIClient, así no hay un Chromium por operador;
+    - un AdaptiveRateLimiter compartido con techo `budget` peticiones/s, así
+      la carga total sobre el TEM no depende de cuántos trabajos corren;
+    - hasta `concurrent_jobs` trabajos a la vez, por prioridad.
+
+    Cada trabajo tiene su propio journal (por ID, no por contenido): si el
+    scheduler se corta, al volver a arrancar los trabajos RUNNING vuelven a
+    la cola y se reanudan desde él.
+    """
+
+    def __init__(self, store: JobStore, username: str, password: str,
+                 budget: float = DEFAULT_BUDGET, concurrent_jobs: int = DEFAULT_CONCURRENT_JOBS,
+                 max_workers: int = DEFAULT_MAX_WORKERS, inbox: str = INBOX_DIR, log=print):
+        self.store = store
+        self.username = username
+        self.password = password
+        self.concurrent_jobs = max(1, concurrent_jobs)
+        self.max_workers = max_workers
+        self.inbox = inbox
+        self.log = log
+        self.limiter = budget_limiter(budget)
+        self.session_manager = SessionManager(pool_maxsize=max(32, self.concurrent_jobs * max_workers))
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def recover(self) -> int:
+        """Devuelve a la cola los trabajos que quedaron RUNNING por un cierre inesperado."""
+        stale = [j for j in self.store.all() if j["status"] == RUNNING]
+        return sum(self.store.update(job["id"], expect=(RUNNING,), status=QUEUED) is not None
+                   for job in stale)
+
+    def run(self, poll: float = 5.0, once: bool = False):
+        """
+        Bucle del scheduler. Con once=True termina cuando no quedan trabajos
+        en cola ni en curso.
+        """
+        ok, msg = self.session_manager.login(self.username, self.password)
+        if not ok:
+            raise RuntimeError(msg)
+        self.log(f"Login: {msg}")
+        recovered = self.recover()
+        if recovered:
+            self.log(f"{recovered} trabajos interrumpidos vuelven a la cola")
+
+        while True:
+            for job in self.store.scan_inbox(self.inbox):
+                self.log(f"[{job['id']}] Encolado desde la bandeja: {os.path.basename(job['source'])}")
+            self._start_jobs()
+            with self._lock:
+                idle = not self._running
+            if once and idle and self.store.next_queued() is None:
+                break
+            time.sleep(poll)
+
+    def _start_jobs(self):
+        with self._lock:
+            while len(self._running) < self.concurrent_jobs:
+                job = self.store.next_queued(exclude=self._running)
+                if job is None:
+                    break
+                # Solo se arranca si sigue en cola: un cancel entre medio gana
+                job = self.store.update(job["id"], expect=(QUEUED,), status=RUNNING,
+                                        started=time.time(), error=None)
+                if job is None:
+                    continue
+                thread = threading.Thread(target=self._run_job, args=(job,), name=f"job-{job['id']}", daemon=True)
+                self._running[job["id"]] = thread
+                thread.start()
+
+    def _run_job(self, job: dict):
+        self.log(f"[{job['id']}] Iniciando (prioridad {job['priority']}): {os.path.basename(job['source'])}")
+        try:
+            status, rows, ok = self.process(job)
+            if self.store.update(job["id"], expect=(RUNNING,), status=status, rows=rows, ok=ok,
+                                 finished=time.time()) is None:
+                # Cancelado después del último control: queda CANCELLED con el avance real
+                self.store.update(job["id"], rows=rows, ok=ok)
+                status = CANCELLED
+            self.log(f"[{job['id']}] {status}: {ok}/{rows} filas OK")
+        except Exception as e:
+            self.store.update(job["id"], expect=(RUNNING,), status=FAILED, error=str(e), finished=time.time())
+            self.log(f"[{job['id']}] FAILED: {e}")
+        finally:
+            with self._lock:
+                self._running.pop(job["id"], None)
+
+    def process(self, job: dict):
+        """
+        Procesa un trabajo con la sesión y el limiter compartidos; devuelve
+        (estado, filas, ok). Como en el GUI, se precarga el índice de
+        'Migración' y las filas sin ID se resuelven por serial (UPDATE,
+        UNCHANGED o CREATE) en vez de crearse siempre.
+        """
+        sm = self.session_manager
+        api = APIClient(sm.get_session(), sm.get_csrf(), rate_limiter=self.limiter, session_manager=sm)
+        tem = TEMAutomation(sm, rate_limiter=self.limiter, skip_unchanged=True)
+        count = tem.prefetch_index(max_workers=self.max_workers)
+        self.log(f"[{job['id']}] Índice de Migración: {count} terminales")
+        result_path = f"{os.path.splitext(job['input'])[0]}_result.jsonl"
+        rows = ok = 0
+        status = DONE
+
+        with CheckpointJournal(self.store.journal_path(job["id"])) as journal, \
+                open(result_path, "w", encoding="utf-8") as out:
+            results = process_records(iter_records(job["input"]), api,
+                                      max_workers=self.max_workers, journal=journal, tem=tem)
+            for result in results:
+                out.write(json.dumps({"row": result["row"], "status": result["status"],
+                                      "response": result.get("response")}, ensure_ascii=False) + "\n")
+                rows += 1
+                ok += result["status"] in ("OK", "UNCHANGED")
+                if rows % CANCEL_CHECK_ROWS == 0:
+                    self.store.update(job["id"], rows=rows, ok=ok)
+                    if self.store.get(job["id"])["status"] == CANCELLED:
+                        status = CANCELLED
+                        results.close()
+                        break
+
+        merge_results(job["input"], [result_path], job["output"])
+        return status, rows, ok
+
+
+def format_jobs(jobs: list) -> str:
+    lines = [f"{'ID':<22} {'ESTADO':<10} {'PRIO':>4} {'FILAS':>7} {'OK':>7}  ARCHIVO"]
+    for j in jobs:
+        lines.append(f"{j['id']:<22} {j['status']:<10} {j['priority']:>4} {j['rows']:>7} {j['ok']:>7}  "
+                     f"{os.path.basename(j['source'])}" + (f"  ({j['error']})" if j.get("error") else ""))
+    return "\n".join(lines)
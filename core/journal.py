@@ -0,0 +1,118 @@
+# core/journal.py
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+JOURNAL_DIR = os.path.join("logs", "journal")
+
+# Estados que cuentan como fila terminada (no se repiten al reanudar)
+DONE_STATUSES = {"OK", "UNCHANGED"}
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash SHA-256 del contenido del archivo de entrada (identifica la corrida)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CheckpointJournal:
+    """
+    Bitácora append-only (JSONL) de filas procesadas, una por archivo de entrada.
+
+    Cada línea: {"row", "serial", "action", "id", "status", "ts"}.
+    Se escribe con flush + fsync por entrada, así un cierre inesperado del GUI
+    pierde como máximo la fila en curso. Al reanudar, is_done(row) es O(1).
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._entries = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._load()
+        self._fh = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def for_input(cls, input_path: str, directory: str = JOURNAL_DIR, **kwargs):
+        """Journal asociado al contenido del archivo (mismo Excel → mismo journal)."""
+        return cls(os.path.join(directory, f"{file_hash(input_path)}.jsonl"), **kwargs)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # línea cortada por un cierre a mitad de escritura
+            self._entries[entry["row"]] = entry
+        if data and not data.endswith(b"\n"):
+            # Cerrar la línea incompleta para no pegarle la siguiente entrada
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+
+    def record(self, row, serial, action, term_id, status):
+        entry = {
+            "row": row,
+            "serial": serial,
+            "action": action,
+            "id": term_id,
+            "status": status,
+            "ts": datetime.now().isoformat(timespec="seconds")
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._fh.write(line)
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+            self._entries[row] = entry
+        return entry
+
+    def get(self, row):
+        return self._entries.get(row)
+
+    def is_done(self, row) -> bool:
+        entry = self._entries.get(row)
+        return entry is not None and entry["status"] in DONE_STATUSES
+
+    def done_count(self) -> int:
+        return sum(1 for e in self._entries.values() if e["status"] in DONE_STATUSES)
+
+    def entries(self):
+        return list(self._entries.values())
+
+    def rotate(self) -> str:
+        """
+        Archiva el journal actual como <nombre>.<fecha>.jsonl y sigue con uno
+        vacío: la corrida empieza de cero sin perder el historial anterior.
+        Devuelve la ruta del archivo archivado.
+        """
+        stem, ext = os.path.splitext(self.path)
+        archived = f"{stem}.{datetime.now():%Y%m%d_%H%M%S}{ext}"
+        with self._lock:
+            self._fh.close()
+            os.replace(self.path, archived)
+            self._entries = {}
+            self._fh = open(self.path, "a", encoding="utf-8")
+        return archived
+
+    def close(self):
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
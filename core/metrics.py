@@ -0,0 +1,158 @@
+# core/metrics.py
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# Límites de los buckets (segundos) para el histograma estilo Prometheus
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Muestras guardadas por endpoint para calcular p50/p95/p99 con memoria acotada
+RESERVOIR_SIZE = 10000
+
+
+def endpoint_name(url: str) -> str:
+    """.../rest/dms/terminals/terminalLights/?full=false → 'terminalLights'."""
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    return parts[-1] if parts else url
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples = []
+        self.statuses = defaultdict(int)
+        self.retries = 0
+
+    def observe(self, status, latency):
+        self.count += 1
+        self.total += latency
+        self.statuses[status] += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                break
+        # Reservoir sampling: muestra uniforme sin guardar todas las latencias
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(latency)
+        else:
+            j = random.randrange(self.count)
+            if j < RESERVOIR_SIZE:
+                self.samples[j] = latency
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRecorder:
+    """
+    Métricas de una corrida: latencia por endpoint (histograma + p50/p95/p99),
+    conteo por código HTTP, reintentos, tiempo de espera del rate limiter y filas/segundo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = defaultdict(_EndpointStats)
+            self.rows = 0
+            self.throttle_wait = 0.0
+            self.started = time.monotonic()
+
+    def observe(self, endpoint: str, status, latency: float):
+        """status es el código HTTP o el nombre de la excepción si no hubo respuesta."""
+        with self._lock:
+            self._endpoints[endpoint].observe(status, latency)
+
+    def retry(self, endpoint: str):
+        with self._lock:
+            self._endpoints[endpoint].retries += 1
+
+    def wait(self, seconds: float):
+        with self._lock:
+            self.throttle_wait += seconds
+
+    def row_done(self, n: int = 1):
+        with self._lock:
+            self.rows += n
+
+    def rows_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "elapsed": round(time.monotonic() - self.started, 2),
+                "rows": self.rows,
+                "rows_per_second": round(self.rows_per_second(), 2),
+                "throttle_wait": round(self.throttle_wait, 2),
+                "endpoints": {
+                    name: {
+                        "count": st.count,
+                        "avg": round(st.total / st.count, 4) if st.count else 0.0,
+                        "p50": round(st.percentile(0.50), 4),
+                        "p95": round(st.percentile(0.95), 4),
+                        "p99": round(st.percentile(0.99), 4),
+                        "statuses": dict(st.statuses),
+                        "retries": st.retries
+                    }
+                    for name, st in self._endpoints.items()
+                }
+            }
+
+    def format_summary(self) -> str:
+        s = self.summary()
+        lines = [f"Filas: {s['rows']} en {s['elapsed']}s ({s['rows_per_second']} filas/s) | "
+                 f"espera por rate limit: {s['throttle_wait']}s"]
+        for name, e in sorted(s["endpoints"].items()):
+            statuses = ", ".join(f"{k}={v}" for k, v in sorted(e["statuses"].items(), key=str))
+            lines.append(f"  {name}: {e['count']} llamadas | p50 {e['p50']}s p95 {e['p95']}s "
+                         f"p99 {e['p99']}s | {statuses} | reintentos {e['retries']}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Formato de texto de Prometheus (para node_exporter textfile o inspección manual)."""
+        out = [
+            "# TYPE tem_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name, st in sorted(self._endpoints.items()):
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, st.buckets):
+                    cumulative += n
+                    out.append(f'tem_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+                out.append(f'tem_request_duration_seconds_bucket{{endpoint="{name}",le="+Inf"}} {st.count}')
+                out.append(f'tem_request_duration_seconds_sum{{endpoint="{name}"}} {st.total:.6f}')
+                out.append(f'tem_request_duration_seconds_count{{endpoint="{name}"}} {st.count}')
+            out.append("# TYPE tem_requests_total counter")
+            for name, st in sorted(self._endpoints.items()):
+                for status, n in sorted(st.statuses.items(), key=lambda kv: str(kv[0])):
+                    out.append(f'tem_requests_total{{endpoint="{name}",status="{status}"}} {n}')
+            out.append("# TYPE tem_retries_total counter")
+            for name, st in sorted(self._endpoints.items()):
+                out.append(f'tem_retries_total{{endpoint="{name}"}} {st.retries}')
+            out.append("# TYPE tem_rows_total counter")
+            out.append(f"tem_rows_total {self.rows}")
+            out.append("# TYPE tem_throttle_wait_seconds_total counter")
+            out.append(f"tem_throttle_wait_seconds_total {self.throttle_wait:.6f}")
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+# Métricas del proceso, compartidas por TEMAutomation, APIClient y el GUI
+METRICS = MetricsRecorder()
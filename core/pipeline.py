@@ -0,0 +1,261 @@
+# core/pipeline.py
+import math
+import queue
+import threading
+import time
+
+_DONE = object()
+DEFAULT_QUEUE_SIZE = 64
+REBALANCE_EVERY = 0.25   # segundos entre ajustes de hilos por etapa
+STOP_POLL = 0.1          # cada cuánto un hilo bloqueado en una cola revisa close()
+
+
+class StageStats:
+    """Contadores de una etapa: filas, tiempo ocupado, esperando entrada y bloqueada por la salida."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.workers = 0
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy, starved, blocked, error=False):
+        with self._lock:
+            self.processed += 1
+            self.errors += int(error)
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+
+    @property
+    def latency(self):
+        """Tiempo promedio de una fila en la etapa, o None si todavía no procesó ninguna."""
+        return self.busy / self.processed if self.processed else None
+
+    def as_dict(self):
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "errors": self.errors,
+            "busy": round(self.busy, 2),
+            "starved": round(self.starved, 2),
+            "blocked": round(self.blocked, 2),
+            "latency_ms": round((self.latency or 0) * 1000, 1),
+            # Ocupación promedio por hilo: la etapa más alta es el cuello de botella
+            "load": round(self.busy / max(1, self.workers), 2)
+        }
+
+
+class Pipeline:
+    """
+    Pipeline por etapas con colas acotadas entre ellas.
+
+    stages: lista de (nombre, func, máximo de hilos). Cada func recibe la
+    salida de la etapa anterior. Las colas de tamaño `queue_size` dan
+    backpressure: una etapa rápida se adelanta hasta llenar su cola y luego espera.
+
+    Cada etapa arranca con un hilo y se dimensiona con la latencia medida
+    (ley de Little): hilos = caudal objetivo × latencia por fila, donde el
+    caudal objetivo es el máximo que permite la etapa más limitada. Así una
+    validación que va a la red recibe los hilos que necesita para que la
+    escritura no quede esperando, y una búsqueda resuelta por índice no.
+
+    run() entrega tuplas (item de entrada, resultado) en el orden de entrada; si
+    una etapa lanza una excepción, esa fila salta las etapas siguientes y el
+    resultado es la excepción. Si el iterable de entrada falla, se entregan las
+    filas ya leídas y luego se relanza su excepción. Cerrar el generador (o
+    close()) detiene todos los hilos.
+    """
+
+    def __init__(self, stages: list, queue_size: int = DEFAULT_QUEUE_SIZE, rebalance_every: float = REBALANCE_EVERY):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.rebalance_every = rebalance_every
+        self.stats = [StageStats(name, max(1, workers)) for name, _, workers in stages]
+        self._queues = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._remaining = []
+        self._closed = []
+        self._feed_error = None
+
+    def run(self, items):
+        self._queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        self._stop.clear()
+        self._remaining = [0] * len(self.stages)
+        self._closed = [False] * len(self.stages)
+        self._feed_error = None
+        threading.Thread(target=self._feed, args=(items,), name="pipeline-feed", daemon=True).start()
+        for i in range(len(self.stages)):
+            self._add_worker(i)
+
+        # Reordenar por número de secuencia
+        out = self._queues[-1]
+        buffered = {}
+        next_seq = 0
+        last_check = time.monotonic()
+        try:
+            while True:
+                try:
+                    msg = out.get(timeout=self.rebalance_every)
+                except queue.Empty:
+                    msg = None
+                if time.monotonic() - last_check >= self.rebalance_every:
+                    self.rebalance()
+                    last_check = time.monotonic()
+                if msg is None:
+                    continue
+                if msg is _DONE:
+                    break
+                seq, item, value = msg
+                buffered[seq] = (item, value)
+                while next_seq in buffered:
+                    yield buffered.pop(next_seq)
+                    next_seq += 1
+            if self._feed_error is not None:
+                raise self._feed_error
+        finally:
+            # Salida normal, error o consumidor que dejó de iterar: se liberan los hilos
+            self.close()
+
+    def close(self):
+        """Detiene los hilos aunque estén bloqueados en una cola llena o vacía."""
+        self._stop.set()
+
+    def _put(self, q, msg) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(msg, timeout=STOP_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=STOP_POLL)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _feed(self, items):
+        first = self._queues[0]
+        try:
+            for seq, item in enumerate(items):
+                if not self._put(first, (seq, item, item)):
+                    return
+        except Exception as e:
+            # Se avisa al consumidor después de las filas ya leídas
+            self._feed_error = e
+        finally:
+            self._put(first, _DONE)
+
+    def _add_worker(self, i) -> bool:
+        stats = self.stats[i]
+        with self._lock:
+            if self._closed[i] or stats.workers >= stats.max_workers:
+                return False
+            stats.workers += 1
+            self._remaining[i] += 1
+            n = stats.workers
+        threading.Thread(target=self._work, args=(i, self.stages[i][1]),
+                         name=f"pipeline-{stats.name}-{n}", daemon=True).start()
+        return True
+
+    def rebalance(self):
+        """
+        Ajusta los hilos de cada etapa a su latencia medida. El caudal objetivo
+        es el de la etapa más limitada con todos sus hilos (máximo / latencia);
+        cada etapa recibe los hilos para sostenerlo. Solo se agregan hilos.
+        """
+        measured = [(st, st.latency) for st in self.stats]
+        if any(lat is None for _, lat in measured):
+            return  # sin una fila medida en cada etapa todavía no hay base para decidir
+        target = min(st.max_workers / max(lat, 1e-6) for st, lat in measured)
+        for i, (st, lat) in enumerate(measured):
+            wanted = min(st.max_workers, max(1, math.ceil(target * lat)))
+            while st.workers < wanted and self._add_worker(i):
+                pass
+
+    def _work(self, i, func):
+        inbox, outbox, stats = self._queues[i], self._queues[i + 1], self.stats[i]
+        while True:
+            t0 = time.perf_counter()
+            msg = self._get(inbox)
+            t1 = time.perf_counter()
+            if msg is _DONE:
+                break
+            seq, item, value = msg
+            error = isinstance(value, Exception)
+            if not error:
+                try:
+                    value = func(value)
+                except Exception as e:
+                    value, error = e, True
+            t2 = time.perf_counter()
+            if not self._put(outbox, (seq, item, value)):
+                return
+            stats.add(t2 - t1, t1 - t0, time.perf_counter() - t2, error)
+
+        if self._stop.is_set():
+            return
+        # El aviso de fin vuelve a la cola para los demás hilos de la etapa
+        # (la cantidad de hilos puede haber cambiado); el último avisa a la siguiente
+        self._put(inbox, _DONE)
+        with self._lock:
+            self._remaining[i] -= 1
+            last = self._remaining[i] == 0
+            if last:
+                self._closed[i] = True
+        if last:
+            self._put(outbox, _DONE)
+
+    def stage_stats(self) -> dict:
+        return {st.name: dict(st.as_dict(), queued=self._queues[i + 1].qsize() if self._queues else 0)
+                for i, st in enumerate(self.stats)}
+
+    def bottleneck(self) -> str:
+        return max(self.stats, key=lambda st: st.busy / max(1, st.workers)).name
+
+    def format_stats(self) -> str:
+        return " | ".join(
+            f"{name}: {s['processed']} filas, {s['workers']} hilos, {s['latency_ms']} ms/fila, "
+            f"ocupado {s['load']}s/hilo, sin trabajo {s['starved']}s, bloqueado {s['blocked']}s"
+            for name, s in self.stage_stats().items()
+        ) + f" → cuello de botella: {self.bottleneck()}"
+
+
+def terminal_pipeline(tem, max_workers: int, queue_size: int = DEFAULT_QUEUE_SIZE) -> Pipeline:
+    """
+    Pipeline búsqueda → validación → escritura para TEMAutomation.
+    Entrada: (fila, serial, codigo). Resultado: el dict de save_terminal.
+    Cada etapa puede llegar a max_workers hilos; cuántos usa de verdad lo
+    decide la latencia medida (ver Pipeline.rebalance): con índice y caché
+    calientes la búsqueda y la validación se quedan con pocos, y si la
+    validación va a la red crece hasta no frenar a la escritura.
+    """
+
+    def lookup(item):
+        row, serial, codigo = item
+        action, existing_id = tem.plan_terminal(serial, codigo)
+        return {"row": row, "serial": serial, "codigo": codigo, "action": action, "id": existing_id}
+
+    def validate(ctx):
+        if tem.needs_validation(ctx["action"]):
+            ctx["valid"] = tem.validate_signature(ctx["serial"])
+        return ctx
+
+    def write(ctx):
+        return tem.save_terminal(ctx["serial"], ctx["codigo"], ctx["action"], ctx["id"], ctx.get("valid"))
+
+    return Pipeline([
+        ("lookup", lookup, max_workers),
+        ("validate", validate, max_workers),
+        ("write", write, max_workers),
+    ], queue_size)
@@ -0,0 +1,78 @@
+# core/preprocess.py
+import time
+import pandas as pd
+
+ISSUE_COLUMN = "ISSUE"
+
+
+def normalize_text_column(series: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de clean_codigo_punto para una columna completa:
+    quita espacios, convierte '1234.0' → '1234' y deja vacíos los nulos/'nan'.
+    """
+    text = series.astype("string").str.strip()
+    text = text.str.replace(r"\.0$", "", regex=True)
+    text = text.fillna("")
+    return text.mask(text.str.lower().isin(["nan", "none", "<na>"]), "").astype(object)
+
+
+def _delete_mask(df: pd.DataFrame) -> pd.Series:
+    mask = pd.Series(False, index=df.index)
+    if "ACTION" in df.columns:
+        mask |= normalize_text_column(df["ACTION"]).str.lower().eq("delete")
+    if "DELETE" in df.columns:
+        mask |= normalize_text_column(df["DELETE"]).str.lower().eq("yes")
+    return mask
+
+
+def prepare_dataframe(df: pd.DataFrame, dedupe: bool = True, deletes: bool = True):
+    """
+    Normaliza SERIAL/CODIGO_PUNTO en bloque y marca las filas inválidas antes
+    de enviar cualquier petición al TEM.
+
+    - SERIAL vacío → inválida, salvo una fila de eliminación con ID.
+    - Con deletes=False (flujos que solo crean/actualizan, como el GUI) toda
+      fila de eliminación es inválida: nunca se envía como alta o cambio.
+    - SERIAL repetido → se conserva la última aparición (la instrucción más reciente).
+
+    Devuelve (válidas, inválidas, reporte). Ambos DataFrames conservan el índice
+    original, así la fila de la hoja sigue siendo índice + 2. Las inválidas
+    traen la columna ISSUE con el motivo.
+    """
+    started = time.perf_counter()
+    out = df.copy()
+
+    raw_serial = out["SERIAL"].astype("string").str.strip()
+    out["SERIAL"] = normalize_text_column(out["SERIAL"])
+    out["CODIGO_PUNTO"] = normalize_text_column(out["CODIGO_PUNTO"])
+    float_fixed = int((raw_serial.fillna("") != out["SERIAL"]).sum())
+
+    issue = pd.Series("", index=out.index, dtype=object)
+    delete = _delete_mask(out)
+    has_id = normalize_text_column(out["ID"]).ne("") if "ID" in out.columns else False
+    blank = out["SERIAL"].eq("") & ~(delete & has_id & deletes)
+    issue[blank] = "SERIAL vacío"
+    rejected_deletes = delete & ~blank if not deletes else pd.Series(False, index=out.index)
+    issue[rejected_deletes] = "Eliminación no soportada en este flujo"
+
+    duplicates = pd.Series(False, index=out.index)
+    if dedupe:
+        key = out["SERIAL"].str.upper()
+        duplicates = key.duplicated(keep="last") & key.ne("")
+        issue[duplicates & ~blank & ~rejected_deletes] = "SERIAL duplicado (se usa la última fila)"
+
+    out[ISSUE_COLUMN] = issue
+    invalid_mask = issue.ne("")
+    valid = out[~invalid_mask].drop(columns=[ISSUE_COLUMN])
+    invalid = out[invalid_mask]
+
+    report = {
+        "total": len(out),
+        "valid": len(valid),
+        "blank_serial": int(blank.sum()),
+        "deletes_rejected": int(rejected_deletes.sum()),
+        "duplicates": int(duplicates.sum()),
+        "normalized_serials": float_fixed,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+    return valid, invalid, report
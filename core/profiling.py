@@ -0,0 +1,285 @@
+# core/profiling.py
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from datetime import datetime
+
+PROFILE_DIR = os.path.join("logs", "profile")
+STAGES = ("ingest", "lookup", "validate", "write", "log", "UI")
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+_NULL = nullcontext()
+
+
+class _Stage:
+    """Context manager de una etapa; mide tiempo y memoria y marca el hilo para el muestreo."""
+
+    __slots__ = ("profiler", "name", "outer", "t0", "m0")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        p = self.profiler
+        p._enter_thread()
+        stack = p._stacks[threading.get_ident()]
+        # Una etapa anidada en sí misma (ej. delete_batch al bisecar) solo se
+        # mide en su llamada más externa: si no, sus segundos se suman dos veces
+        self.outer = self.name not in stack
+        stack.append(self.name)
+        self.m0 = tracemalloc.get_traced_memory()[0] if p.memory else 0
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        p = self.profiler
+        elapsed = time.perf_counter() - self.t0
+        mem = tracemalloc.get_traced_memory()[0] - self.m0 if p.memory else 0
+        p._stacks[threading.get_ident()].pop()
+        if not self.outer:
+            return
+        with p._lock:
+            st = p.stages[self.name]
+            st["calls"] += 1
+            st["seconds"] += elapsed
+            st["max"] = max(st["max"], elapsed)
+            st["mem_delta"] += mem
+
+
+class Profiler:
+    """
+    Perfilado opcional de una corrida completa, por etapas con nombre
+    (ingest, lookup, validate, write, log, UI).
+
+    - stage(nombre): tiempo y llamadas por etapa, y variación de memoria
+      (tracemalloc; aproximada cuando varios hilos asignan a la vez).
+    - cProfile por hilo: ranking de funciones por tiempo acumulado.
+    - Muestreo de pilas (sys._current_frames) de los hilos dentro de una
+      etapa: salida "collapsed" para flamegraph.pl / speedscope, con la
+      etapa como raíz de cada pila.
+
+    Apagado, stage() devuelve un contexto nulo y no mide nada.
+    """
+
+    def __init__(self):
+        # Hilo → su cProfile activo; cada hilo apaga el suyo (ver stage()).
+        # Sobrevive a _reset(): un hilo puede seguir con el de la corrida anterior.
+        self._active = {}
+        self._reset()
+
+    def _reset(self):
+        self.enabled = False
+        self.memory = False
+        self.stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "max": 0.0, "mem_delta": 0})
+        self.samples = Counter()
+        self.started = None
+        self.elapsed = 0.0
+        self._stacks = defaultdict(list)
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def start(self, memory: bool = True, interval: float = SAMPLE_INTERVAL):
+        self._reset()
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, args=(interval,), name="profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.elapsed = time.perf_counter() - self.started
+        self._stop.set()
+        self._sampler.join()
+        self._release_thread()
+        # Los hilos que ya terminaron no pueden apagar su cProfile: se olvidan
+        alive = {t.ident for t in threading.enumerate()}
+        with self._lock:
+            self._active = {ident: p for ident, p in self._active.items() if ident in alive}
+
+    def record(self, name: str, seconds: float, mem_delta: int = 0):
+        """Suma a una etapa un tramo medido antes de start() (ej. la carga del Excel en el GUI)."""
+        with self._lock:
+            st = self.stages[name]
+            st["calls"] += 1
+            st["seconds"] += seconds
+            st["max"] = max(st["max"], seconds)
+            st["mem_delta"] += mem_delta
+
+    def stage(self, name: str):
+        if not self.enabled:
+            if self._active:
+                self._release_thread()
+            return _NULL
+        return _Stage(self, name)
+
+    def _enter_thread(self):
+        """La primera vez que un hilo entra a una etapa se le activa su propio cProfile."""
+        ident = threading.get_ident()
+        if ident in self._profiles:
+            return
+        self._release_thread()  # el cProfile de una corrida anterior que este hilo no apagó
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            profile = None  # otro profiler activo en este hilo: queda solo el muestreo
+        with self._lock:
+            self._profiles[ident] = profile
+            if profile is not None:
+                self._active[ident] = profile
+
+    def _release_thread(self):
+        """
+        cProfile solo se puede apagar desde el hilo que lo activó: los hilos
+        que siguen vivos tras stop() lo apagan en su próxima llamada a stage().
+        Se usa disable() del propio profile: desde 3.12 cProfile va sobre
+        sys.monitoring y sys.setprofile(None) no lo apagaría.
+        """
+        with self._lock:
+            profile = self._active.pop(threading.get_ident(), None)
+        if profile is not None:
+            profile.disable()
+
+    def _sample(self, interval):
+        me = threading.get_ident()
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            for ident, stack in list(self._stacks.items()):
+                # El hilo perfilado puede sacar su etapa en cualquier momento: se lee una sola vez
+                top = stack[-1:]
+                if ident == me or not top or ident not in frames:
+                    continue
+                calls = []
+                frame = frames[ident]
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join([top[0], *reversed(calls)])] += 1
+
+    # ==========================================================
+    # 📄 REPORTES
+    # ==========================================================
+    def stage_report(self) -> list:
+        """Etapas ordenadas por tiempo total (suma de todos los hilos)."""
+        by_stage = Counter()
+        for key, count in self.samples.items():
+            by_stage[key.split(";", 1)[0]] += count
+        total_samples = sum(by_stage.values()) or 1
+        rows = []
+        for name, st in self.stages.items():
+            rows.append({
+                "stage": name,
+                "calls": st["calls"],
+                "seconds": round(st["seconds"], 3),
+                "avg_ms": round(st["seconds"] / st["calls"] * 1000, 3) if st["calls"] else 0,
+                "max_ms": round(st["max"] * 1000, 1),
+                "mem_delta_mb": round(st["mem_delta"] / (1024 * 1024), 2),
+                "samples_pct": round(by_stage[name] / total_samples * 100, 1)
+            })
+        return sorted(rows, key=lambda r: r["seconds"], reverse=True)
+
+    def _stats(self):
+        profiles = [p for p in self._profiles.values() if p is not None]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for p in profiles[1:]:
+            stats.add(p)
+        return stats
+
+    def report(self, directory: str = None) -> str:
+        """
+        Escribe en `directory` (por defecto logs/profile/<fecha>):
+          report.txt       etapas, funciones (cProfile) y asignaciones (tracemalloc)
+          profile.pstats   para snakeviz / pstats
+          stacks.collapsed para flamegraph.pl o speedscope
+        Devuelve la ruta del reporte.
+        """
+        self.stop()
+        directory = directory or os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d_%H%M%S}")
+        os.makedirs(directory, exist_ok=True)
+
+        out = io.StringIO()
+        out.write(f"Corrida perfilada: {self.elapsed:.2f}s\n\n")
+        out.write(f"{'ETAPA':<10} {'LLAMADAS':>9} {'TOTAL s':>9} {'PROM ms':>9} {'MÁX ms':>9} "
+                  f"{'MEM MB':>8} {'MUESTRAS':>9}\n")
+        for r in self.stage_report():
+            out.write(f"{r['stage']:<10} {r['calls']:>9} {r['seconds']:>9} {r['avg_ms']:>9} {r['max_ms']:>9} "
+                      f"{r['mem_delta_mb']:>8} {r['samples_pct']:>8}%\n")
+
+        stats = self._stats()
+        if stats is not None:
+            stats.dump_stats(os.path.join(directory, "profile.pstats"))
+            out.write(f"\n===== Funciones por tiempo acumulado (top {TOP_FUNCTIONS}) =====\n")
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+        if self.memory and tracemalloc.is_tracing():
+            out.write(f"\n===== Memoria retenida por línea (top {TOP_ALLOCATIONS}) =====\n")
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+            tracemalloc.stop()
+
+        with open(os.path.join(directory, "stacks.collapsed"), "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        path = os.path.join(directory, "report.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        return path
+
+    def summary_lines(self, limit: int = 6) -> list:
+        return [f"{r['stage']}: {r['seconds']}s en {r['calls']} llamadas "
+                f"({r['avg_ms']} ms prom., {r['samples_pct']}% de muestras)"
+                for r in self.stage_report()[:limit]]
+
+
+PROFILER = Profiler()
+
+
+def stage(name: str):
+    """Atajo: `with stage("write"): ...` sobre el profiler global."""
+    return PROFILER.stage(name)
+
+
+def profiled(name: str):
+    """Decorador: cada llamada a la función cuenta como la etapa `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILER.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profiled_iter(name: str, iterable):
+    """Recorre `iterable` midiendo cada next() como la etapa `name` (ej. lectura del Excel)."""
+    it = iter(iterable)
+    while True:
+        with PROFILER.stage(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
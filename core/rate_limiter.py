@@ -0,0 +1,218 @@
+# core/rate_limiter.py
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from .metrics import METRICS
+
+# Códigos con los que el TEM indica que hay que bajar el ritmo y reintentar
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 502, 503, 504}
+# Peticiones/s al TEM sumando todos los trabajos o procesos de una corrida
+DEFAULT_BUDGET = 20.0
+
+
+def parse_retry_after(value):
+    """Interpreta el header Retry-After (segundos o fecha HTTP). Devuelve segundos o None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Backoff exponencial con 'full jitter' para no sincronizar los reintentos de los hilos."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket compartido por todas las llamadas al TEM.
+
+    - Sube el ritmo (aumento aditivo) mientras las respuestas son rápidas y exitosas.
+    - Lo baja (reducción multiplicativa) con 429/503 o cuando la latencia sube.
+    - Retry-After pausa a todos los hilos hasta la hora indicada por el servidor.
+    """
+
+    def __init__(self, rate: float = 10.0, min_rate: float = 0.5, max_rate: float = 100.0,
+                 burst: float = None, increase: float = 0.2, decrease: float = 0.5,
+                 latency_target: float = 2.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._latency_ewma = None
+        self._latency_floor = None
+        self._lock = threading.Lock()
+
+    def _capacity(self):
+        return self.burst or max(1.0, self.rate)
+
+    def reserve(self) -> float:
+        """Toma un token si hay; si no, devuelve cuántos segundos esperar antes de reintentar."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self._capacity(), self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible."""
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Como acquire(), pero cede el event loop mientras espera (cliente asyncio)."""
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def on_response(self, status_code: int, latency: float, retry_after: float = None):
+        """Ajusta el ritmo según el resultado de una petición."""
+        with self._lock:
+            if status_code in THROTTLE_STATUSES:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._tokens = 0.0
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                return
+
+            self._latency_ewma = latency if self._latency_ewma is None else \
+                0.8 * self._latency_ewma + 0.2 * latency
+            if self._latency_floor is None or self._latency_ewma < self._latency_floor:
+                self._latency_floor = self._latency_ewma
+
+            # "Lento" = sobre el objetivo absoluto, o latencia triplicada respecto al mejor valor visto
+            slow = (self._latency_ewma > self.latency_target or
+                    (self._latency_ewma > 3 * self._latency_floor and
+                     self._latency_ewma > self.latency_target / 4))
+            if status_code >= 500 or slow:
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            elif status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_error(self):
+        """Error de red (timeout, conexión rechazada): se trata como congestión."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+
+def budget_limiter(budget: float = DEFAULT_BUDGET) -> AdaptiveRateLimiter:
+    """Limiter con techo fijo de `budget` peticiones/s (arranca en 10/s o menos)."""
+    return AdaptiveRateLimiter(rate=min(10.0, budget), min_rate=min(0.5, budget), max_rate=budget)
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_default_limiter() -> AdaptiveRateLimiter:
+    """Limiter global del proceso, compartido por TEMAutomation, APIClient y AsyncAPIClient."""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = AdaptiveRateLimiter()
+        return _default_limiter
+
+
+def request_with_retry(send, limiter: AdaptiveRateLimiter = None, max_retries: int = 3,
+                       endpoint: str = "tem", metrics=METRICS):
+    """
+    Ejecuta send() (una llamada de requests) respetando el limiter.
+    Reintenta 429/502/503/504 y errores de red con Retry-After o backoff con jitter.
+    Cada intento queda registrado en `metrics` bajo el nombre `endpoint`.
+    """
+    limiter = limiter or get_default_limiter()
+    attempt = 0
+    while True:
+        waited = time.monotonic()
+        limiter.acquire()
+        started = time.monotonic()
+        metrics.wait(started - waited)
+        try:
+            resp = send()
+        except OSError as e:  # requests.RequestException hereda de IOError
+            metrics.observe(endpoint, type(e).__name__, time.monotonic() - started)
+            limiter.on_error()
+            if attempt >= max_retries:
+                raise
+            metrics.retry(endpoint)
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        latency = time.monotonic() - started
+        metrics.observe(endpoint, resp.status_code, latency)
+        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+        limiter.on_response(resp.status_code, latency, retry_after)
+        if resp.status_code not in RETRY_STATUSES or attempt >= max_retries:
+            return resp
+
+        metrics.retry(endpoint)
+        if retry_after is None:
+            time.sleep(backoff_delay(attempt))
+        # con Retry-After el propio limiter.acquire() espera la pausa indicada
+        attempt += 1
+
+
+async def arequest_with_retry(send, limiter: AdaptiveRateLimiter = None, max_retries: int = 3,
+                              endpoint: str = "tem", metrics=METRICS, errors=(OSError, asyncio.TimeoutError)):
+    """
+    Versión asyncio de request_with_retry: `send` es una corrutina sin argumentos.
+    Usa el mismo limiter, las mismas reglas de reintento y las mismas métricas.
+    `errors` son las excepciones de red que se reintentan.
+    """
+    limiter = limiter or get_default_limiter()
+    attempt = 0
+    while True:
+        waited = time.monotonic()
+        await limiter.acquire_async()
+        started = time.monotonic()
+        metrics.wait(started - waited)
+        try:
+            resp = await send()
+        except errors as e:
+            metrics.observe(endpoint, type(e).__name__, time.monotonic() - started)
+            limiter.on_error()
+            if attempt >= max_retries:
+                raise
+            metrics.retry(endpoint)
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        latency = time.monotonic() - started
+        metrics.observe(endpoint, resp.status_code, latency)
+        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+        limiter.on_response(resp.status_code, latency, retry_after)
+        if resp.status_code not in RETRY_STATUSES or attempt >= max_retries:
+            return resp
+
+        metrics.retry(endpoint)
+        if retry_after is None:
+            await asyncio.sleep(backoff_delay(attempt))
+        attempt += 1
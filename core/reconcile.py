@@ -0,0 +1,128 @@
+# core/reconcile.py
+import hashlib
+import re
+
+import pandas as pd
+
+from .preprocess import ISSUE_COLUMN
+
+RESPONSE_MAX_CHARS = 200
+
+_SPACES = re.compile(r"\s+")
+
+
+def compact_response(text, max_chars: int = RESPONSE_MAX_CHARS):
+    """
+    Acorta el cuerpo de una respuesta para guardarlo por fila: espacios
+    colapsados, a lo sumo max_chars caracteres y, si se cortó, el sha1 y el
+    tamaño original (una página HTML de error no queda entera en memoria).
+    """
+    if text is None:
+        return None
+    text = str(text)
+    short = _SPACES.sub(" ", text[:max_chars * 4]).strip()
+    if len(text) <= max_chars and len(short) <= max_chars:
+        return short
+    digest = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()[:12]
+    return f"{short[:max_chars]}… [sha1:{digest}, {len(text)} chars]"
+
+
+def _key(series: pd.Series) -> pd.Series:
+    return series.astype("string").str.strip().str.upper()
+
+
+def journal_frame(entries) -> pd.DataFrame:
+    """
+    Resultados del journal por fila de la hoja (no por serial: varias filas
+    de eliminación sin SERIAL no deben colapsar en una sola).
+    """
+    df = pd.DataFrame(list(entries), columns=["row", "serial", "action", "id", "status"])
+    df["row"] = df["row"].astype("int64")
+    df = df.drop_duplicates("row", keep="last")
+    return df.rename(columns={"row": "ROW", "action": "ACTION", "id": "JOURNAL_ID", "status": "STATUS"})[
+        ["ROW", "ACTION", "JOURNAL_ID", "STATUS"]]
+
+
+def snapshot_frame(snapshot) -> pd.DataFrame:
+    """Columnas del snapshot del TEM (ya normalizadas y sin duplicados)."""
+    return pd.DataFrame({
+        "KEY": pd.Series(snapshot.column("key"), dtype="string"),
+        "TEM_ID": pd.Series(snapshot.column("id"), dtype="string"),
+        "TEM_NAME": pd.Series(snapshot.column("name"), dtype="string"),
+    })
+
+
+def reconcile(df: pd.DataFrame, entries, snapshot, invalid: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Une las filas de entrada (SERIAL, CODIGO_PUNTO) con el journal de la
+    corrida (por fila) y con un snapshot fresco del TEM (por serial
+    normalizado; un SERIAL vacío no se cruza), y clasifica cada fila:
+
+        VERIFICADO      la corrida terminó bien y el TEM tiene el nombre esperado
+        NO_ENCONTRADO   la corrida dijo OK pero el terminal no está en el TEM
+        SIGUE_EN_TEM    se eliminó bien pero el terminal sigue en el TEM
+        NOMBRE_DISTINTO está en el TEM con otro nombre
+        FALLIDO         la fila terminó con error
+        SIN_PROCESAR    la fila no aparece en el journal
+        NO_ENVIADO      la fila no pasó la validación previa (`invalid`, con ISSUE)
+    """
+    out = pd.DataFrame({
+        "ROW": df.index + 2,
+        "SERIAL": df["SERIAL"].astype("string"),
+        "CODIGO_PUNTO": df["CODIGO_PUNTO"].astype("string"),
+    })
+    out = out.merge(journal_frame(entries), on="ROW", how="left")
+    key = _key(out["SERIAL"])
+    out["KEY"] = key.mask(key == "")
+    out = out.merge(snapshot_frame(snapshot), on="KEY", how="left")
+
+    codigo = out["CODIGO_PUNTO"].fillna("")
+    expected = codigo.where(codigo != "", out["SERIAL"])
+    in_tem = out["TEM_ID"].notna()
+    done = out["STATUS"].isin(["OK", "UNCHANGED"])
+    deleted = out["ACTION"] == "DELETE"
+    same_name = out["TEM_NAME"].fillna("") == expected.fillna("")
+
+    rules = [
+        (out["STATUS"].isna(), "SIN_PROCESAR"),
+        (~done, "FALLIDO"),
+        (deleted & in_tem, "SIGUE_EN_TEM"),
+        (deleted, "VERIFICADO"),
+        (~in_tem, "NO_ENCONTRADO"),
+        (~same_name, "NOMBRE_DISTINTO"),
+    ]
+    # Se aplican de la última a la primera: gana la primera regla que se cumple
+    result = pd.Series("VERIFICADO", index=out.index, dtype="string")
+    for condition, label in reversed(rules):
+        result = result.mask(condition.fillna(False).astype(bool), label)
+    out["RECONCILIATION"] = result
+    out = out.drop(columns="KEY")
+
+    if invalid is not None and len(invalid):
+        skipped = pd.DataFrame({
+            "ROW": invalid.index + 2,
+            "SERIAL": invalid["SERIAL"].astype("string"),
+            "CODIGO_PUNTO": invalid["CODIGO_PUNTO"].astype("string"),
+            "RECONCILIATION": "NO_ENVIADO",
+            ISSUE_COLUMN: invalid[ISSUE_COLUMN],
+        })
+        out = pd.concat([out, skipped], ignore_index=True).sort_values("ROW", ignore_index=True)
+    return out
+
+
+def write_report(rec: pd.DataFrame, path: str) -> str:
+    """
+    Excel compacto: hoja 'Conciliacion' con una fila por entrada y hoja
+    'Resumen' con las tablas acción × resultado y estado × resultado.
+    """
+    by_action = pd.crosstab(rec["ACTION"].fillna("-"), rec["RECONCILIATION"], margins=True, margins_name="Total")
+    by_status = pd.crosstab(rec["STATUS"].fillna("-"), rec["RECONCILIATION"], margins=True, margins_name="Total")
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        rec.to_excel(writer, sheet_name="Conciliacion", index=False)
+        by_action.to_excel(writer, sheet_name="Resumen", startrow=0)
+        by_status.to_excel(writer, sheet_name="Resumen", startrow=len(by_action) + 3)
+    return path
+
+
+def summary(rec: pd.DataFrame) -> dict:
+    return rec["RECONCILIATION"].value_counts().to_dict()
@@ -1,65 +1,248 @@
 # core/session_manager.py
 from playwright.sync_api import sync_playwright
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from .auth_cache import cache_path, save_auth_state, load_auth_state, clear_auth_state
+from .endpoints import LOGIN_URL, CONTEXT_URL, auth_headers
+
+# Recursos que no hacen falta para autenticarse (se bloquean en el navegador)
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net",
+                 "hotjar.com", "newrelic.com", "nr-data.net", "segment.io")
+
+# Pool de conexiones: suficiente para el máximo de peticiones simultáneas del GUI
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 32
+
+
+def build_session(pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                  pool_block: bool = True) -> requests.Session:
+    """
+    Crea un requests.Session con pool de conexiones keep-alive ajustado.
+
+    - pool_connections: cantidad de hosts con pool propio.
+    - pool_maxsize: conexiones máximas por host (límite de conexiones simultáneas).
+    - pool_block: si es True, los hilos esperan una conexión libre en vez de
+      abrir conexiones extra que luego se descartan (y repetir el handshake TLS).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def connection_stats(session: requests.Session) -> dict:
+    """Métricas de reutilización: conexiones abiertas vs peticiones enviadas por el pool."""
+    connections = requests_sent = hosts = 0
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts += 1
+            connections += pool.num_connections
+            requests_sent += pool.num_requests
+    return {
+        "hosts": hosts,
+        "connections": connections,
+        "requests": requests_sent,
+        "reused": max(0, requests_sent - connections),
+        "reuse_ratio": (requests_sent - connections) / requests_sent if requests_sent else 0.0
+    }
+
+
+def is_auth_failure(resp) -> bool:
+    """401/403 o un rechazo del token CSRF: la sesión del TEM expiró."""
+    if resp is None:
+        return False
+    if resp.status_code in (401, 403):
+        return True
+    return 400 <= resp.status_code < 500 and "csrf" in (resp.text or "")[:2000].lower()
+
+
+def request_with_reauth(session_manager, send, on_refresh=None):
+    """
+    Ejecuta send(); si el TEM rechaza la sesión, re-autentica una sola vez
+    (los demás hilos esperan a ese mismo login) y repite la petición.
+    `on_refresh` permite al cliente actualizar sus headers con el nuevo CSRF.
+    """
+    if session_manager is None:
+        return send()
+    generation = session_manager.generation
+    resp = send()
+    if not is_auth_failure(resp) or not session_manager.refresh(generation):
+        return resp
+    if on_refresh is not None:
+        on_refresh()
+    return send()
 
-BASE = "https://estate-manager-nar03.icloud.ingenico.com"
-LOGIN_URL = f"{BASE}/emgui/"
-CONTEXT_URL = f"{BASE}/emgui/rest/home/context"
 
 class SessionManager:
-    def __init__(self, debug: bool = False):
+    def __init__(self, debug: bool = False, pool_connections: int = POOL_CONNECTIONS,
+                 pool_maxsize: int = POOL_MAXSIZE, pool_block: bool = True):
         self.debug = debug
-        self.session = requests.Session()
+        self.session = build_session(pool_connections, pool_maxsize, pool_block)
         self.csrf_token = None
+        # Se incrementa en cada login/refresh; evita que N hilos re-autentiquen a la vez
+        self.generation = 0
+        self._credentials = None
+        self._refresh_lock = threading.Lock()
 
-    def login(self, username: str, password: str) -> (bool, str):
+    def login(self, username: str, password: str, use_cache: bool = True) -> (bool, str):
         """
         Inicia sesión headless en el TEM, copia las cookies al requests.Session
         y obtiene el token CSRF necesario para las peticiones REST.
-        """
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                if self.debug:
-                    print("[*] Abriendo login:", LOGIN_URL)
-                page.goto(LOGIN_URL)
 
-                # Ingreso de credenciales
-                page.fill('input[name="username"]', username)
-                page.fill('input[name="password"]', password)
-                page.keyboard.press("Enter")
-                page.wait_for_load_state("networkidle")
+        Con use_cache=True primero intenta reutilizar la sesión guardada en disco
+        para ese usuario (validada con /rest/home/context) y solo abre Chromium
+        si ya no sirve. La contraseña no se compara con el caché: si no es la
+        correcta, el re-login de refresh() falla igual que un login normal.
+        """
+        if use_cache and self.login_from_cache(username):
+            self._credentials = (username, password)
+            return True, "Login OK (sesión en caché)"
 
-                # Guardar cookies
-                cookies = page.context.cookies()
-                browser.close()
+        try:
+            cookies = self._browser_login(username, password)
 
             # Transferir cookies a requests
             for c in cookies:
-                self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"))
+                self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path") or "/")
 
             # Solicitar el contexto para obtener el token CSRF
-            ctx = self.session.get(CONTEXT_URL, headers={"x-csrf-request": "true"})
-            ctx.raise_for_status()
-            self.csrf_token = ctx.headers.get("x-csrf-token")
-
-            if not self.csrf_token:
+            if not self.fetch_csrf():
                 return False, "Login OK, pero no se encontró token CSRF"
+            self._credentials = (username, password)
+            self.generation += 1
+            try:
+                save_auth_state(cache_path(username), cookies, self.csrf_token)
+            except OSError as e:
+                if self.debug:
+                    print("[!] No se pudo guardar la sesión en caché:", e)
             return True, "Login OK"
 
         except Exception as e:
             return False, f"Error en login con Playwright: {e}"
 
+    def login_from_cache(self, username: str) -> bool:
+        """Restaura cookies + CSRF del caché en disco si el TEM todavía acepta la sesión."""
+        path = cache_path(username)
+        state = load_auth_state(path)
+        if state is None:
+            return False
+
+        if self.restore_auth_state(state):
+            if self.debug:
+                print("[*] Sesión restaurada desde caché:", path)
+            return True
+
+        # Caché vencido del lado del servidor: descartarlo
+        clear_auth_state(path)
+        return False
+
+    def restore_auth_state(self, state: dict) -> bool:
+        """
+        Carga cookies de un estado ya verificado (caché o proceso padre) y
+        confirma la sesión pidiendo el CSRF. Sin credenciales: si la sesión
+        vence, refresh() no puede repetir el login.
+        """
+        for c in state["cookies"]:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path") or "/")
+        try:
+            if self.fetch_csrf():
+                self.generation += 1
+                return True
+        except Exception:
+            pass
+        self.session.cookies.clear()
+        return False
+
+    def export_auth_state(self) -> dict:
+        """Cookies de la sesión actual, para restaurarlas en otro proceso sin pasar la contraseña."""
+        return {"cookies": [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+                            for c in self.session.cookies]}
+
+    @staticmethod
+    def _block_heavy(route):
+        """Aborta imágenes, fuentes y analítica: no se necesitan para obtener las cookies."""
+        request = route.request
+        host = urlparse(request.url).hostname or ""
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or host.endswith(BLOCKED_HOSTS):
+            route.abort()
+        else:
+            route.continue_()
+
+    def _browser_login(self, username: str, password: str) -> list:
+        """Login con Chromium headless; devuelve las cookies de la sesión."""
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            page = browser.new_page()
+            page.route("**/*", self._block_heavy)
+            if self.debug:
+                print("[*] Abriendo login:", LOGIN_URL)
+            page.goto(LOGIN_URL)
+
+            # Ingreso de credenciales
+            page.fill('input[name="username"]', username)
+            page.fill('input[name="password"]', password)
+            page.keyboard.press("Enter")
+            page.wait_for_load_state("networkidle")
+
+            # Guardar cookies
+            cookies = page.context.cookies()
+            browser.close()
+        return cookies
+
+    def fetch_csrf(self) -> bool:
+        """Pide /rest/home/context con las cookies actuales y guarda el token CSRF."""
+        ctx = self.session.get(CONTEXT_URL, headers={"x-csrf-request": "true"})
+        ctx.raise_for_status()
+        token = ctx.headers.get("x-csrf-token")
+        if not token:
+            return False
+        self.csrf_token = token
+        return True
+
+    def refresh(self, seen_generation: int = None) -> bool:
+        """
+        Renueva la sesión sin intervención del usuario.
+        1. Si otro hilo ya la renovó (generation cambió), no hace nada.
+        2. Intenta obtener un CSRF nuevo reutilizando las cookies vigentes.
+        3. Solo si las cookies ya no sirven, repite el login con Playwright.
+        """
+        with self._refresh_lock:
+            if seen_generation is not None and seen_generation != self.generation:
+                return True
+
+            try:
+                if self.fetch_csrf():
+                    self.generation += 1
+                    if self.debug:
+                        print("[*] CSRF renovado con las cookies actuales")
+                    return True
+            except Exception:
+                pass  # cookies vencidas: hace falta login completo
+
+            if not self._credentials:
+                return False
+            ok, msg = self.login(*self._credentials, use_cache=False)
+            if self.debug:
+                print("[*] Re-login:", msg)
+            return ok
+
     def get_session(self):
         return self.session
 
     def get_csrf(self):
         return self.csrf_token
 
+    def connection_stats(self):
+        return connection_stats(self.session)
+
     def auth_headers(self):
-        return {
-            "x-csrf-token": self.csrf_token,
-            "Content-Type": "application/json",
-            "Accept": "application/json, text/plain, */*"
-        }
+        return auth_headers(self.csrf_token)
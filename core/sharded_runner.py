@@ -0,0 +1,200 @@
+# core/sharded_runner.py
+import json
+import multiprocessing
+import os
+import zlib
+
+from .api_client import APIClient
+from .engine import DEFAULT_MAX_WORKERS
+from .excel_processor import CSV_EXTENSIONS, iter_records, open_csv
+from .metrics import METRICS
+from .profiling import PROFILER
+from .rate_limiter import DEFAULT_BUDGET, budget_limiter
+from .session_manager import SessionManager
+from .tem_automation import TEMAutomation
+from .terminal_index import normalize_signature
+from .worker import process_records, DELETE_BATCH_SIZE
+
+# Trabajo de red: más procesos no aceleran si el presupuesto de peticiones es el mismo
+DEFAULT_PROCESSES = 2
+
+
+def shard_of(serial: str, shards: int) -> int:
+    """Shard estable por hash del serial (crc32, igual en todos los procesos y corridas)."""
+    return zlib.crc32(normalize_signature(serial).encode("utf-8")) % shards
+
+
+def split_input(input_path: str, shards: int, work_dir: str) -> list:
+    """
+    Lee el archivo una sola vez (streaming) y reparte los registros en
+    `shards` archivos JSONL. Devuelve las rutas de cada shard.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    paths = [os.path.join(work_dir, f"input_{k}.jsonl") for k in range(shards)]
+    files = [open(p, "w", encoding="utf-8") for p in paths]
+    try:
+        for rec in iter_records(input_path):
+            files[shard_of(rec["SERIAL"] or str(rec["id"]), shards)].write(json.dumps(rec, ensure_ascii=False) + "\n")
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _read_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def run_shard(job: dict) -> dict:
+    """
+    Proceso hijo: restaura la sesión con las cookies del proceso padre (la
+    contraseña nunca llega a los hijos), procesa su shard con su parte del
+    presupuesto de peticiones y escribe sus resultados en un JSONL propio.
+    Las filas sin ID se resuelven por serial contra el índice del padre.
+
+    Nunca lanza: un error devuelve un resumen con ok=False y las filas ya
+    escritas, para que el padre igual haga el merge de los demás shards.
+    """
+    METRICS.reset()  # el Pool puede reutilizar un proceso para más de un shard
+    rows = 0
+    try:
+        if job.get("profile"):
+            PROFILER.start()
+        sm = SessionManager()
+        if not sm.restore_auth_state(job["auth_state"]):
+            return {"shard": job["shard"], "ok": False, "error": "La sesión del proceso padre no es válida",
+                    "rows": 0}
+
+        limiter = budget_limiter(job["budget"])
+        api = APIClient(sm.get_session(), sm.get_csrf(), rate_limiter=limiter, session_manager=sm)
+        # Índice que el padre descargó en esta misma corrida; si no está, cada fila busca su serial
+        tem = TEMAutomation(sm, rate_limiter=limiter, skip_unchanged=True)
+        if job.get("snapshot_path"):
+            tem.load_index(job["snapshot_path"])
+        with open(job["result_path"], "w", encoding="utf-8") as out:
+            for result in process_records(_read_jsonl(job["input_path"]), api,
+                                          max_workers=job["max_workers"],
+                                          delete_batch_size=job["delete_batch_size"], tem=tem):
+                out.write(json.dumps({"row": result["row"], "status": result["status"],
+                                      "response": result.get("response")}, ensure_ascii=False) + "\n")
+                rows += 1
+        work_dir = os.path.dirname(job["result_path"])
+        if job.get("prometheus"):
+            METRICS.write_prometheus(os.path.join(work_dir, f"metrics_{job['shard']}.prom"))
+        summary = {"shard": job["shard"], "ok": True, "rows": rows, "metrics": METRICS.format_summary()}
+        if job.get("profile"):
+            summary["profile"] = PROFILER.report(os.path.join(work_dir, f"profile_{job['shard']}"))
+        return summary
+    except Exception as e:
+        return {"shard": job["shard"], "ok": False, "error": f"{type(e).__name__}: {e}", "rows": rows}
+
+
+def merge_results(input_path: str, result_paths: list, output_path: str):
+    """
+    Une los resultados de todos los shards con el archivo original y escribe
+    el Excel anotado con las columnas Result/API_Response (mismo formato que
+    process_dataframe). Se recorre la hoja en streaming, fila por fila.
+    """
+    from openpyxl import Workbook, load_workbook
+
+    results = {}
+    for path in result_paths:
+        for r in _read_jsonl(path):
+            results[r["row"]] = r
+
+    out_wb = Workbook(write_only=True)
+    out_ws = out_wb.create_sheet("Resultados")
+
+    if os.path.splitext(input_path)[1].lower() in CSV_EXTENSIONS:
+        # Mismo delimitador y codificación que iter_records: las filas deben coincidir
+        src, rows = open_csv(input_path)
+    else:
+        src = load_workbook(input_path, read_only=True, data_only=True)
+        rows = src.active.iter_rows(values_only=True)
+
+    try:
+        header = list(next(rows, ()))
+        out_ws.append(header + ["Result", "API_Response"])
+        for row, values in enumerate(rows, start=2):
+            r = results.get(row)
+            out_ws.append(list(values) + ([r["status"], r["response"]] if r else [None, None]))
+    finally:
+        src.close()
+    out_wb.save(output_path)
+
+
+def run_sharded(input_path: str, output_path: str, username: str, password: str,
+                processes: int = DEFAULT_PROCESSES, max_workers: int = DEFAULT_MAX_WORKERS,
+                delete_batch_size: int = DELETE_BATCH_SIZE, work_dir: str = None,
+                profile: bool = False, budget: float = DEFAULT_BUDGET, prometheus: bool = False,
+                log=print) -> list:
+    """
+    Ejecución headless: login único en el padre, reparto del archivo por
+    hash de serial en N procesos y merge final.
+
+    Los hijos reciben las cookies de la sesión (no la contraseña) y cada uno
+    un limiter con budget/N peticiones/s, así el total contra el TEM no
+    depende de cuántos procesos se usen. El padre descarga una vez el índice
+    de 'Migración' y lo deja como snapshot en work_dir: los hijos resuelven
+    las filas sin ID por serial, como el GUI. Si un shard falla, el merge se
+    hace igual con lo que sí se procesó.
+    Con profile=True cada shard deja su reporte en <work_dir>/profile_k/ y
+    con prometheus=True sus métricas en <work_dir>/metrics_k.prom.
+    """
+    processes = max(1, processes or DEFAULT_PROCESSES)
+    work_dir = work_dir or f"{os.path.splitext(output_path)[0]}_shards"
+
+    sm = SessionManager()
+    ok, msg = sm.login(username, password)
+    if not ok:
+        raise RuntimeError(msg)
+    log(f"Login: {msg}")
+    auth_state = sm.export_auth_state()
+
+    os.makedirs(work_dir, exist_ok=True)
+    snapshot_path = os.path.join(work_dir, "migracion.snap")
+    tem = TEMAutomation(sm, rate_limiter=budget_limiter(budget))
+    count = tem.prefetch_index(max_workers=max_workers, snapshot_path=snapshot_path)
+    if tem.index_synced is None or not os.path.exists(snapshot_path):
+        # Descarga incompleta: sin índice confiable, los hijos buscan cada serial en el TEM
+        log(f"⚠️ Índice de Migración incompleto ({count} terminales); se busca fila por fila")
+        snapshot_path = None
+    else:
+        log(f"Índice de Migración: {count} terminales")
+
+    input_paths = split_input(input_path, processes, work_dir)
+    jobs = [{
+        "shard": k,
+        "input_path": input_paths[k],
+        "result_path": os.path.join(work_dir, f"result_{k}.jsonl"),
+        "auth_state": auth_state,
+        "snapshot_path": snapshot_path,
+        "budget": budget / processes,
+        "max_workers": max_workers,
+        "delete_batch_size": delete_batch_size,
+        "profile": profile,
+        "prometheus": prometheus
+    } for k in range(processes)]
+
+    summaries = []
+    # "spawn" funciona igual en Windows y Linux
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        for summary in pool.imap_unordered(run_shard, jobs):
+            log(f"Shard {summary['shard']}: {'OK' if summary['ok'] else summary['error']} "
+                f"({summary['rows']} filas)")
+            if summary.get("metrics"):
+                log(summary["metrics"])
+            if summary.get("profile"):
+                log(f"Perfilado shard {summary['shard']}: {summary['profile']}")
+            summaries.append(summary)
+
+    failed = [s["shard"] for s in summaries if not s["ok"]]
+    if failed:
+        log(f"⚠️ Shards con error: {sorted(failed)}; sus filas sin resultado quedan vacías en la salida")
+    merge_results(input_path, [job["result_path"] for job in jobs if os.path.exists(job["result_path"])],
+                  output_path)
+    log(f"Resultado: {output_path}")
+    return summaries
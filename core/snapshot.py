@@ -0,0 +1,222 @@
+# core/snapshot.py
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+
+from .action_log import get_action_logger
+from .engine import DEFAULT_MAX_WORKERS
+from .terminal_index import TerminalIndex, normalize_signature, _field
+
+SNAPSHOT_DIR = os.path.join("logs", "snapshot")
+SNAPSHOT_PATH = os.path.join(SNAPSHOT_DIR, "migracion.snap")
+DEFAULT_MAX_AGE = 15 * 60
+
+MAGIC = b"TEMSNAP1"
+# "key" es el signature normalizado: columna ordenada para buscar por bisección
+COLUMNS = ("key", "id", "signature", "name", "type")
+_HEADER = struct.Struct("<8sQ")
+
+
+def _pad(f):
+    """Alinea cada bloque a 8 bytes para poder castear los offsets sobre el mmap."""
+    extra = -f.tell() % 8
+    if extra:
+        f.write(b"\0" * extra)
+
+
+def write_snapshot(path: str, items, synced: float = None) -> int:
+    """
+    Escribe el snapshot en formato columnar:
+
+        MAGIC | posición del header | por columna: offsets (uint64) + datos UTF-8 | header JSON
+
+    `synced` es el momento de la última descarga completa desde el TEM (por
+    defecto ahora); de ahí se calcula la antigüedad del snapshot.
+
+    Las filas se ordenan por signature normalizado (sin duplicados). Se escribe
+    en un temporal y se reemplaza al final: un lector nunca ve un archivo a medias.
+    Devuelve la cantidad de filas.
+    """
+    rows = {}
+    for item in items:
+        key = normalize_signature(_field(item, "signature"))
+        if key:
+            rows[key] = item
+    keys = sorted(rows)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    blocks = {}
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        for col in COLUMNS:
+            offsets = array("Q", [0])
+            data = bytearray()
+            for key in keys:
+                value = key if col == "key" else _field(rows[key], col)
+                data += b"" if value is None else str(value).encode("utf-8")
+                offsets.append(len(data))
+            _pad(f)
+            off_at = f.tell()
+            f.write(offsets.tobytes())
+            data_at = f.tell()
+            f.write(data)
+            blocks[col] = [off_at, data_at]
+
+        header = json.dumps({
+            "rows": len(keys),
+            "created": time.time(),
+            "synced": synced or time.time(),
+            "columns": blocks
+        }).encode("utf-8")
+        _pad(f)
+        header_at = f.tell()
+        f.write(header)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, header_at))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(keys)
+
+
+class Snapshot:
+    """
+    Snapshot de la carpeta 'Migración' mapeado en memoria (mmap): abrirlo no
+    lee las columnas, y las búsquedas por signature son bisecciones sobre la
+    columna ordenada, sin armar diccionarios.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_at = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} no es un snapshot del TEM")
+        self.meta = json.loads(self._mm[header_at:])
+        self.rows = self.meta["rows"]
+        self._view = memoryview(self._mm)
+        self._offsets = {}
+        self._data = {}
+        for col, (off_at, data_at) in self.meta["columns"].items():
+            self._offsets[col] = self._view[off_at:data_at].cast("Q")
+            self._data[col] = data_at
+
+    @property
+    def synced(self) -> float:
+        return self.meta["synced"]
+
+    @property
+    def age(self) -> float:
+        """Segundos desde la descarga completa desde el TEM que originó el snapshot."""
+        return time.time() - self.synced
+
+    def value(self, col: str, i: int) -> str:
+        offsets, base = self._offsets[col], self._data[col]
+        return self._mm[base + offsets[i]:base + offsets[i + 1]].decode("utf-8")
+
+    def column(self, col: str):
+        return (self.value(col, i) for i in range(self.rows))
+
+    def row(self, i: int) -> dict:
+        return {col: self.value(col, i) or None for col in COLUMNS if col != "key"}
+
+    def find(self, serial) -> int:
+        """Posición del signature en el snapshot, o -1."""
+        key = normalize_signature(serial)
+        keys = _ColumnView(self, "key")
+        i = bisect_left(keys, key)
+        return i if i < self.rows and keys[i] == key else -1
+
+    def get(self, serial):
+        i = self.find(serial)
+        return self.row(i) if i >= 0 else None
+
+    def get_id(self, serial):
+        item = self.get(serial)
+        return item["id"] if item else None
+
+    def __contains__(self, serial):
+        return self.find(serial) >= 0
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.rows))
+
+    def to_index(self) -> TerminalIndex:
+        index = TerminalIndex()
+        for item in self:
+            index.add(item)
+        return index
+
+    def close(self):
+        # Las vistas sobre el mmap deben soltarse antes de cerrarlo
+        for view in self.__dict__.get("_offsets", {}).values():
+            view.release()
+        if "_view" in self.__dict__:
+            self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _ColumnView:
+    """Secuencia de solo lectura sobre una columna, para usar bisect sin copiarla."""
+
+    def __init__(self, snapshot: Snapshot, col: str):
+        self.snapshot = snapshot
+        self.col = col
+
+    def __len__(self):
+        return self.snapshot.rows
+
+    def __getitem__(self, i):
+        return self.snapshot.value(self.col, i)
+
+
+def export_snapshot(tem, path: str = SNAPSHOT_PATH, max_workers: int = DEFAULT_MAX_WORKERS) -> int:
+    """
+    Exporta toda la carpeta 'Migración' paginando terminalLights en paralelo
+    y la guarda como snapshot. Devuelve la cantidad de terminales.
+    """
+    rows = write_snapshot(path, tem.iter_folder_terminals(max_workers=max_workers))
+    tem._log_action("EXPORT", "-", "OK", f"{rows} terminales → {path}")
+    return rows
+
+
+def save_index_snapshot(index: TerminalIndex, path: str = SNAPSHOT_PATH, synced: float = None) -> int:
+    """
+    Vuelca un índice ya descargado (ver prefetch_index) sin volver a paginar.
+    No trae cambios del TEM: `synced` es el de esa descarga, y el snapshot
+    solo se usa para lecturas (simulación); las corridas que escriben y la
+    conciliación descargan de nuevo.
+    """
+    return write_snapshot(path, index.values(), synced)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH, max_age: float = DEFAULT_MAX_AGE):
+    """Abre el snapshot si existe y tiene menos de max_age segundos; si no, None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        snap = Snapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        get_action_logger().log("SNAPSHOT", "-", "ERROR", f"Snapshot ilegible ({path}): {e}")
+        return None
+    if max_age is not None and snap.age > max_age:
+        snap.close()
+        return None
+    return snap
@@ -1,28 +1,180 @@
 # core/tem_automation.py
 import json
-import requests
-from datetime import datetime
 import os
+import time
+from .action_log import get_action_logger, TEXT_LOG_PATH
+from .metrics import endpoint_name
+from .rate_limiter import request_with_retry
+from .endpoints import (TERMINAL_TYPE, SAVE_OR_UPDATE_URL, VALIDATE_SIGNATURE_URL,
+                        encode_search, encode_terminal, terminal_lights_url)
+from .session_manager import request_with_reauth
+from .engine import imap_ordered, DEFAULT_MAX_WORKERS
+from .profiling import profiled
+from .snapshot import SNAPSHOT_PATH, DEFAULT_MAX_AGE, load_snapshot, save_index_snapshot
+from .terminal_index import TerminalIndex, normalize_signature
+from .validation_cache import ValidationCache, parse_validation
 
-LOG_PATH = os.path.join("logs", "automation_log.txt")
+LOG_PATH = TEXT_LOG_PATH
+PAGE_SIZE = 500
 
 
 class TEMAutomation:
-    def __init__(self, session_manager):
+    def __init__(self, session_manager, rate_limiter=None, max_retries=3, skip_unchanged=False):
+        self.session_manager = session_manager
         self.session = session_manager.get_session()
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
         self.csrf = session_manager.get_csrf()
         self.headers = session_manager.auth_headers()
+        self.index = None
+        self.index_synced = None
+        self.skip_unchanged = skip_unchanged
+        self.validation_cache = ValidationCache()
 
         # Crear carpeta logs si no existe
         os.makedirs("logs", exist_ok=True)
+        self.action_log = get_action_logger()
 
     # ==========================================================
     # 🧾 LOGGING
     # ==========================================================
     def _log_action(self, action, serial, status, detail=""):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] {action.upper()} | {serial} | {status} | {detail}\n")
+        # Solo encola: el hilo escritor de ActionLogger escribe por lotes (texto + JSONL)
+        self.action_log.log(action, serial, status, detail)
+
+    # ==========================================================
+    # 🌐 PETICIONES AL TEM
+    # ==========================================================
+    def _request(self, method: str, url: str, **kwargs):
+        """
+        Envía la petición con el limiter compartido (ritmo adaptativo, 429/503, Retry-After).
+        Si la sesión expiró (401/403/CSRF) se re-autentica y se repite una vez.
+        """
+        return request_with_reauth(
+            self.session_manager,
+            lambda: request_with_retry(
+                lambda: self.session.request(method, url, headers=self.headers, **kwargs),
+                self.rate_limiter, self.max_retries, endpoint_name(url)
+            ),
+            self._sync_auth
+        )
+
+    def _sync_auth(self):
+        """Toma el CSRF renovado por SessionManager.refresh()."""
+        self.csrf = self.session_manager.get_csrf()
+        self.headers = self.session_manager.auth_headers()
+
+    # ==========================================================
+    # 🔍 BÚSQUEDA EN LA CARPETA MIGRACIÓN
+    # ==========================================================
+    @staticmethod
+    def _extract_items(data):
+        items = data.get("data") if isinstance(data, dict) else data
+        return items or []
+
+    def fetch_folder_page(self, start: int, length: int = PAGE_SIZE):
+        """
+        Una página de terminalLights sobre 'Migración'.
+        Devuelve (items, total); total es None si el TEM no informa recordsTotal.
+        """
+        resp = self._request("POST", terminal_lights_url(start, length), data=encode_search())
+        resp.raise_for_status()
+        data = resp.json()
+        total = data.get("recordsTotal") if isinstance(data, dict) else None
+        return self._extract_items(data), total
+
+    def iter_folder_terminals(self, page_size: int = PAGE_SIZE, max_workers: int = 1):
+        """
+        Recorre todos los terminales de 'Migración'.
+        La primera página trae el total; con max_workers > 1 las demás se piden
+        en paralelo (entregadas en orden). Si el TEM no informa el total se
+        sigue página por página hasta una incompleta o vacía.
+        """
+        items, total = self.fetch_folder_page(0, page_size)
+        yield from items
+        if len(items) < page_size:
+            return
+
+        if total is not None and max_workers > 1:
+            starts = range(page_size, int(total), page_size)
+            for page, _ in imap_ordered(lambda st: self.fetch_folder_page(st, page_size), starts, max_workers):
+                yield from page
+            return
+
+        start = page_size
+        while True:
+            items, _ = self.fetch_folder_page(start, page_size)
+            yield from items
+            if len(items) < page_size:
+                break
+            start += page_size
+
+    @profiled("lookup")
+    def prefetch_index(self, page_size: int = PAGE_SIZE, max_workers: int = DEFAULT_MAX_WORKERS,
+                       snapshot_path: str = None, max_age: float = DEFAULT_MAX_AGE,
+                       read_only: bool = False) -> int:
+        """
+        Descarga una sola vez el índice signature → ID de la carpeta 'Migración'.
+        Si la descarga falla a mitad se conserva lo obtenido: los faltantes
+        se resuelven luego con terminal_exists().
+
+        Con snapshot_path se guarda un snapshot de la descarga. Solo con
+        read_only=True (simulación) se acepta en su lugar un snapshot de menos
+        de max_age segundos: no refleja lo borrado o editado en el TEM desde
+        entonces, así que una corrida que escribe siempre descarga de nuevo.
+        """
+        if snapshot_path and read_only:
+            count = self.load_index(snapshot_path, max_age)
+            if count is not None:
+                return count
+
+        index = TerminalIndex()
+        self.index = index
+        self.index_synced = time.time()
+        try:
+            for item in self.iter_folder_terminals(page_size, max_workers):
+                index.add(item)
+        except Exception as e:
+            self.index_synced = None  # índice parcial: no se guarda como snapshot
+            self._log_action("PREFETCH", "-", "ERROR", f"{len(index)} terminales | {e}")
+            return len(index)
+
+        if snapshot_path:
+            # El snapshot es solo un caché: si no se puede escribir se sigue con el índice en memoria
+            try:
+                save_index_snapshot(index, snapshot_path, self.index_synced)
+            except OSError as e:
+                self._log_action("SNAPSHOT", "-", "WARN", f"No se pudo guardar {snapshot_path}: {e}")
+        self._log_action("PREFETCH", "-", "OK", f"{len(index)} terminales")
+        return len(index)
+
+    def load_index(self, snapshot_path: str, max_age: float = None):
+        """
+        Toma el índice de un snapshot en disco sin paginar el TEM. Devuelve la
+        cantidad de terminales, o None si no existe, está dañado o vencido.
+        Solo para snapshots confiables: uno reciente en una simulación, o el
+        que el proceso padre acaba de descargar para sus shards.
+        """
+        snap = load_snapshot(snapshot_path, max_age)
+        if snap is None:
+            return None
+        with snap:
+            self.index = snap.to_index()
+            self.index_synced = snap.synced
+        self._log_action("PREFETCH", "-", "SNAPSHOT", f"{len(self.index)} terminales")
+        return len(self.index)
+
+    def resolve_terminal_id(self, serial: str):
+        """
+        Busca el ID en el índice precargado. Si el índice está completo
+        (index_synced), no estar en él significa que no existe: no se consulta
+        al TEM. Solo sin índice o con uno parcial se busca el serial en la red.
+        """
+        if self.index is not None:
+            term_id = self.index.get_id(serial)
+            if term_id or self.index_synced is not None:
+                return term_id
+        return self.terminal_exists(serial)
 
     # ==========================================================
     # 🔍 VERIFICAR SI EL TERMINAL EXISTE (versión robusta)
@@ -32,41 +184,22 @@ class TEMAutomation:
         Busca un terminal en la carpeta 'Migración' por su signature (más confiable).
         """
         try:
-            url = (
-                "https://estate-manager-nar03.icloud.ingenico.com/"
-                "emgui/rest/dms/terminals/terminalLights/?full=false&length=100&start=0"
-            )
-            payload = {
-                "sortColumns": [{"key": {"header": "NAME"}, "value": True}],
-                "criteriaAndList": [
-                    {"key": {"header": "SIGNATURE"}, "value": serial},
-                    {"key": {"header": "PARENT_ID"}, "value": "2a2c6a55:19875777b4c:-3daa:AC1A2373"},
-                    {"key": {"header": "CATEGORY"}, "value": 1}
-                ],
-                "criteriaOrLists": [],
-                "geoLocationSearch": None,
-                "displayedColumns": [
-                    {"header": "NAME"},
-                    {"header": "SIGNATURE"},
-                    {"header": "TYPE"}
-                ]
-            }
-
-            resp = self.session.post(url, headers=self.headers, json=payload)
+            resp = self._request("POST", terminal_lights_url(0, 100), data=encode_search(serial))
             if not resp.ok:
                 self._log_action("CHECK_EXIST", serial, "FAIL", f"HTTP {resp.status_code}")
                 return None
 
-            data = resp.json()
-            items = data.get("data") if isinstance(data, dict) else data
+            items = self._extract_items(resp.json())
             if not items:
                 self._log_action("CHECK_EXIST", serial, "NOT_FOUND", "No existe en Migración")
                 return None
 
             for item in items:
                 sig = item.get("signature") or item.get("SIGNATURE")
-                if sig and sig.strip().upper() == serial.strip().upper():
+                if sig and normalize_signature(sig) == normalize_signature(serial):
                     term_id = item.get("id") or item.get("ID")
+                    if self.index is not None:
+                        self.index.add(item)
                     self._log_action("CHECK_EXIST", serial, "FOUND", f"ID {term_id}")
                     return term_id
 
@@ -77,63 +210,150 @@ class TEMAutomation:
             self._log_action("CHECK_EXIST", serial, "ERROR", str(e))
             return None
 
+    # ==========================================================
+    # ✔️ VALIDACIÓN DE SIGNATURE (con caché)
+    # ==========================================================
+    @profiled("validate")
+    def validate_signature(self, serial: str):
+        """
+        Consulta validateTerminalSignature y cachea el resultado (TTL + tamaño máximo).
+        Devuelve True/False, o None si la respuesta no permite concluir.
+        """
+        cached = self.validation_cache.get(serial)
+        if cached is not None:
+            return cached
+        try:
+            resp = self._request("GET", VALIDATE_SIGNATURE_URL, params={"signature": serial})
+        except Exception as e:
+            self._log_action("VALIDATE", serial, "ERROR", str(e))
+            return None
+        valid = parse_validation(resp)
+        if valid is not None:
+            self.validation_cache.set(serial, valid)
+        if valid is False:
+            self._log_action("VALIDATE", serial, "INVALID", resp.text[:120])
+        return valid
+
+    @staticmethod
+    def needs_validation(action: str) -> bool:
+        """
+        La validación solo puede bloquear una creación (ver save_terminal): un
+        terminal que ya está en el índice no se valida. Así, al repetir una
+        carga, las filas ya creadas no hacen esa llamada; el índice (y su
+        snapshot en disco) hace de caché persistente de "signature en uso".
+        """
+        return action == "CREATE"
+
+    # ==========================================================
+    # 🧮 MODO DIFF: SOLO ENVIAR LO QUE CAMBIÓ
+    # ==========================================================
+    @profiled("lookup")
+    def plan_terminal(self, serial: str, codigo_punto: str = None):
+        """
+        Compara el terminal deseado con el estado precargado del TEM.
+        Devuelve (acción, id) con acción CREATE, UPDATE o UNCHANGED.
+        """
+        existing_id = self.resolve_terminal_id(serial)
+        if not existing_id:
+            return "CREATE", None
+
+        current = self.index.get(serial) if self.index is not None else None
+        if current is None:
+            return "UPDATE", existing_id
+
+        desired_name = codigo_punto if codigo_punto else serial
+        same_name = str(current.get("name") or "").strip() == desired_name
+        same_type = not current.get("type") or current["type"] == TERMINAL_TYPE
+        if same_name and same_type:
+            return "UNCHANGED", existing_id
+        return "UPDATE", existing_id
+
+    def dry_run_report(self, rows, snapshot_path: str = SNAPSHOT_PATH) -> dict:
+        """
+        Simula la carga sin escribir en el TEM. `rows` son tuplas (serial, codigo_punto).
+        Devuelve los conteos {"CREATE": n, "UPDATE": n, "UNCHANGED": n}.
+        Al ser de solo lectura puede usar un snapshot reciente en vez de descargar.
+        """
+        if self.index is None:
+            self.prefetch_index(snapshot_path=snapshot_path, read_only=True)
+        report = {"CREATE": 0, "UPDATE": 0, "UNCHANGED": 0}
+        for serial, codigo_punto in rows:
+            action, _ = self.plan_terminal(serial, codigo_punto)
+            report[action] += 1
+        self._log_action("DRY_RUN", "-", "OK", json.dumps(report))
+        return report
 
     # ==========================================================
     # 💾 CREAR O ACTUALIZAR TERMINAL
     # ==========================================================
+    def upsert_terminal(self, serial: str, codigo_punto: str = None) -> dict:
+        """
+        Crea o actualiza el terminal y devuelve el detalle:
+        {"ok", "action" (CREATE/UPDATE/UNCHANGED), "id", "status"}.
+        Con skip_unchanged=True no se envía nada si el terminal ya está igual.
+        """
+        action, existing_id = self.plan_terminal(serial, codigo_punto)
+        valid = None
+        if self.needs_validation(action):
+            # Validar firma antes de crear (en reintentos sale del caché)
+            valid = self.validate_signature(serial)
+        return self.save_terminal(serial, codigo_punto, action, existing_id, valid)
+
+    @profiled("write")
+    def save_terminal(self, serial: str, codigo_punto, action: str, existing_id, valid=None) -> dict:
+        """
+        Etapa de escritura: recibe lo ya resuelto por plan_terminal y
+        validate_signature y solo hace el PUT (ver core.pipeline).
+        """
+        if action == "UNCHANGED" and self.skip_unchanged:
+            self._log_action("SKIP", serial, "UNCHANGED", f"ID {existing_id}")
+            return {"ok": True, "action": action, "id": existing_id, "status": "UNCHANGED"}
+
+        # Un terminal existente puede reportar su propio signature como "en uso",
+        # por eso la validación solo bloquea la creación.
+        if valid is False and not existing_id:
+            self._log_action("CREATE", serial, "SKIP", "Signature inválido, no se envía PUT")
+            return {"ok": False, "action": "CREATE", "id": None, "status": "INVALID_SIGNATURE"}
+
+        name = codigo_punto if codigo_punto else serial
+        # Cuerpo armado sobre la plantilla ya serializada (ver core.endpoints)
+        resp = self._request("PUT", SAVE_OR_UPDATE_URL, data=encode_terminal(serial, name, existing_id))
+        ok = resp.status_code == 200
+
+        action = "UPDATE" if existing_id else "CREATE"
+        term_id = existing_id or (self._parse_terminal_id(resp) if ok else None)
+        if ok:
+            # El terminal ya existe con este signature: el resultado positivo se conserva
+            self.validation_cache.set(serial, True)
+        if ok and self.index is not None:
+            # Mantener el índice al día: evita duplicados y sirve al modo diff en la misma corrida
+            self.index.add({"id": term_id, "signature": serial, "name": name, "type": TERMINAL_TYPE})
+        self._log_action(action, serial, "OK" if ok else f"FAIL | HTTP {resp.status_code}", resp.text[:120])
+        return {"ok": ok, "action": action, "id": term_id,
+                "status": "OK" if ok else f"HTTP {resp.status_code}"}
+
     def create_or_update_terminal(self, serial: str, codigo_punto: str = None) -> bool:
         """
         Si el terminal existe, lo actualiza (mantiene el mismo ID).
         Si no, lo crea.
         """
         try:
-            existing_id = self.terminal_exists(serial)
-
-            # Validar firma (siempre antes de PUT)
-            self.session.get(
-                f"https://estate-manager-nar03.icloud.ingenico.com/"
-                f"emgui/rest/dms/terminals/validateTerminalSignature/?signature={serial}",
-                headers=self.headers
-            )
-
-            payload = {
-                "terminalAndGeolocation": {
-                    "id": existing_id if existing_id else None,
-                    "signature": serial,
-                    "name": codigo_punto if codigo_punto else serial,
-                    "description": "",
-                    "status": 0,
-                    "type": "AXIUMNX",
-                    "category": 1,
-                    "parentId": "2a2c6a55:19875777b4c:-3daa:AC1A2373",  # Carpeta Migración
-                    "merchantId": None,
-                    "geoLocation": None,
-                    "customValues": {},
-                    "automaticSwap": False
-                },
-                "tagIds": None,
-                "callSchedule": None,
-                "blockData": None,
-                "attachData": None,
-                "ipRange": None,
-                "wipeRequest": False
-            }
-
-            url = (
-                "https://estate-manager-nar03.icloud.ingenico.com/"
-                "emgui/rest/dms/terminals/saveOrUpdateTerminal/"
-            )
-            resp = self.session.put(url, headers=self.headers, json=payload)
-            ok = resp.status_code == 200
-
-            action = "UPDATE" if existing_id else "CREATE"
-            self._log_action(action, serial, "OK" if ok else f"FAIL | HTTP {resp.status_code}", resp.text[:120])
-            return ok
-
+            return self.upsert_terminal(serial, codigo_punto)["ok"]
         except Exception as e:
             self._log_action("CREATE_OR_UPDATE", serial, "ERROR", str(e))
             return False
 
+    @staticmethod
+    def _parse_terminal_id(resp):
+        """saveOrUpdateTerminal responde el ID como string JSON (ej. "-2087f8da:...")."""
+        try:
+            data = resp.json()
+        except ValueError:
+            return resp.text.strip().strip('"') or None
+        if isinstance(data, dict):
+            return data.get("id") or data.get("ID")
+        return data or None
+
     # ==========================================================
     # 🧩 COMPATIBILIDAD CON CÓDIGO ANTIGUO
     # ==========================================================
@@ -0,0 +1,53 @@
+# core/terminal_index.py
+
+
+def normalize_signature(value) -> str:
+    """Normaliza un signature para usarlo como llave (sin espacios y en mayúsculas)."""
+    if value is None:
+        return ""
+    return str(value).strip().upper()
+
+
+def _field(item: dict, key: str):
+    """El TEM a veces responde las columnas en minúscula y a veces en mayúscula."""
+    value = item.get(key.lower())
+    if value is None:
+        value = item.get(key.upper())
+    return value
+
+
+class TerminalIndex:
+    """
+    Índice en memoria signature → terminal de la carpeta 'Migración'.
+    Se llena una sola vez al inicio del procesamiento para no buscar fila por fila.
+    """
+
+    def __init__(self):
+        self._items = {}
+
+    def add(self, item: dict):
+        key = normalize_signature(_field(item, "signature"))
+        if not key:
+            return
+        self._items[key] = {
+            "id": _field(item, "id"),
+            "signature": _field(item, "signature"),
+            "name": _field(item, "name"),
+            "type": _field(item, "type"),
+        }
+
+    def get(self, serial):
+        return self._items.get(normalize_signature(serial))
+
+    def get_id(self, serial):
+        item = self.get(serial)
+        return item["id"] if item else None
+
+    def values(self):
+        return self._items.values()
+
+    def __contains__(self, serial):
+        return normalize_signature(serial) in self._items
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,75 @@
+# core/validation_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from .terminal_index import normalize_signature
+
+DEFAULT_TTL = 600
+DEFAULT_MAXSIZE = 50000
+
+
+def parse_validation(resp):
+    """
+    Interpreta la respuesta de validateTerminalSignature.
+    Devuelve True/False, o None si no se puede saber (error HTTP, cuerpo raro):
+    en ese caso no se cachea ni se bloquea el PUT.
+    """
+    if resp is None or not resp.ok:
+        return None
+    text = (resp.text or "").strip()
+    if not text:
+        return True
+    try:
+        data = resp.json()
+    except ValueError:
+        lowered = text.strip('"').lower()
+        return {"true": True, "false": False}.get(lowered)
+    if isinstance(data, bool):
+        return data
+    if isinstance(data, dict):
+        for key in ("valid", "isValid", "result", "available"):
+            if isinstance(data.get(key), bool):
+                return data[key]
+        if data.get("error") or data.get("errors"):
+            return False
+    return None
+
+
+class ValidationCache:
+    """Caché LRU con TTL de resultados de validación, por signature normalizado."""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, serial):
+        """Devuelve True/False si hay un resultado vigente, None si no."""
+        key = normalize_signature(serial)
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, serial, value: bool):
+        key = normalize_signature(serial)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, serial):
+        with self._lock:
+            self._data.pop(normalize_signature(serial), None)
+
+    def __len__(self):
+        return len(self._data)
@@ -1,101 +1,233 @@
+import copy
 import time
 import logging
-from .excel_processor import row_to_payload
+from .engine import imap_ordered, DEFAULT_MAX_WORKERS
+from .metrics import METRICS
+from .profiling import profiled, profiled_iter
+from .endpoints import encode_terminal
+from .excel_processor import clean_codigo_punto, dataframe_records, clean_id
+from .reconcile import compact_response
+from .rate_limiter import RETRY_STATUSES
+from .session_manager import is_auth_failure
 
 logger = logging.getLogger(__name__)
 
-def clean_codigo_punto(value):
+DELETE_BATCH_SIZE = 50
+
+
+def is_delete_row(row: dict) -> bool:
+    action = str(row.get("action", "")).strip().lower()
+    return action == "delete" or str(row.get("delete", "")).strip().lower() == "yes"
+
+
+@profiled("write")
+def delete_batch(entries: list, api_client) -> list:
     """
-    Limpia y formatea el código de punto:
-    - Convierte floats (ej. 1234.0 → "1234")
-    - Maneja valores vacíos, nulos o 'nan'
+    Elimina un lote [(idx, term_id), ...] con una sola llamada a deleteTerminals.
+
+    Solo un rechazo del contenido (4xx que no es de sesión) se divide a la
+    mitad hasta aislar los IDs con error, así cada fila del Excel recibe su
+    propio resultado. Un 5xx, un rechazo de sesión o un error de red (ya
+    reintentados con backoff por request_with_retry) marcan el lote entero
+    como fallido: dividirlo solo multiplicaría las llamadas a un TEM con
+    problemas, y las filas quedan pendientes para la próxima corrida.
     """
-    if value is None:
-        return ""
     try:
-        if isinstance(value, float):
-            if value.is_integer():
-                return str(int(value))
-            return str(value)
-        value_str = str(value).strip()
-        if value_str.lower() in ("nan", "none", ""):
-            return ""
-        if value_str.endswith(".0"):
-            # Si viene de Excel como texto tipo "1234.0"
-            value_str = value_str[:-2]
-        return value_str
-    except Exception:
-        return str(value)
-
-
-def process_dataframe(df, api_client, delay=0.3, max_retries=3):
-    results = []
-
-    for idx, raw_row in df.iterrows():
-        row = raw_row.to_dict()
-        action = str(row.get("action", "")).strip().lower()
-
-        # 🔧 Normalizar campos importantes
-        serial = str(row.get("SERIAL") or row.get("serial") or "").strip()
-        codigo_raw = row.get("CODIGO_PUNTO") or row.get("codigo_punto") or row.get("Codigo_Punto")
-        codigo_punto = clean_codigo_punto(codigo_raw)
-
-        try:
-            if action == "delete" or str(row.get("delete", "")).strip().lower() == "yes":
-                # 🔥 Acción: Eliminar terminal
-                term_id = row.get("id")
-                if not term_id:
-                    results.append({
-                        "row": idx + 2,
-                        "status": "SKIP_NO_ID",
-                        "response": "No ID para eliminar"
-                    })
-                    continue
-
-                resp = api_client.delete_terminals([term_id])
-                results.append({
-                    "row": idx + 2,
-                    "status": "OK" if resp.ok else "ERROR",
-                    "code": resp.status_code,
-                    "response": resp.text
-                })
+        resp = api_client.delete_terminals([term_id for _, term_id in entries])
+    except Exception as e:
+        logger.exception("Error eliminando lote")
+        return [{"row": idx + 2, "status": "EXCEPTION", "response": str(e), "action": "DELETE", "id": term_id}
+                for idx, term_id in entries]
 
-            else:
-                # 🔥 Acción: Crear o actualizar terminal
-                payload = row_to_payload({
-                    **row,
-                    "SERIAL": serial,
-                    "CODIGO_PUNTO": codigo_punto
-                })
-
-                attempt = 0
-                resp = None
-
-                while attempt < max_retries:
-                    resp = api_client.save_or_update(payload)
-                    if resp.ok:
-                        break
-                    attempt += 1
-                    time.sleep(2 ** attempt)
-
-                results.append({
+    if resp.ok:
+        return [{"row": idx + 2, "status": "OK", "code": resp.status_code, "response": resp.text,
+                 "action": "DELETE", "id": term_id}
+                for idx, term_id in entries]
+
+    # 429 ya agotó sus reintentos: es congestión, no un ID rechazado
+    rejected = (400 <= resp.status_code < 500 and resp.status_code not in RETRY_STATUSES
+                and not is_auth_failure(resp))
+    if rejected and len(entries) > 1:
+        mid = len(entries) // 2
+        return delete_batch(entries[:mid], api_client) + delete_batch(entries[mid:], api_client)
+
+    return [{"row": idx + 2, "status": "ERROR", "code": resp.status_code, "response": resp.text,
+             "action": "DELETE", "id": term_id}
+            for idx, term_id in entries]
+
+
+def plan_and_save(idx, serial: str, codigo_punto: str, tem) -> dict:
+    """
+    Crea o actualiza por el mismo camino que el GUI: TEMAutomation resuelve el
+    serial contra el índice de 'Migración' (UPDATE, UNCHANGED o CREATE),
+    valida el signature solo si va a crear y después hace el PUT.
+    """
+    outcome = tem.upsert_terminal(serial, codigo_punto)
+    status = outcome["status"] if outcome["status"] in ("OK", "UNCHANGED") else "ERROR"
+    return {
+        "row": idx + 2,
+        "status": status,
+        "response": outcome["status"] if status == "ERROR" else f"{outcome['action']} {outcome['id']}",
+        "action": outcome["action"],
+        "id": outcome["id"]
+    }
+
+
+@profiled("write")
+def process_row(idx, row: dict, api_client, delay=0, tem=None) -> dict:
+    """
+    Procesa una fila (crear/actualizar o eliminar) y devuelve su resultado.
+
+    Con `tem` (TEMAutomation con el índice precargado) una fila sin ID se
+    resuelve por su serial (ver plan_and_save); sin él, o si la fila trae
+    el ID, se envía directo a saveOrUpdateTerminal.
+    """
+    # 🔧 Normalizar campos importantes
+    serial = str(row.get("SERIAL") or row.get("serial") or "").strip()
+    codigo_raw = row.get("CODIGO_PUNTO") or row.get("codigo_punto") or row.get("Codigo_Punto")
+    codigo_punto = clean_codigo_punto(codigo_raw)
+
+    try:
+        if is_delete_row(row):
+            # 🔥 Acción: Eliminar terminal
+            term_id = row.get("id")
+            if not term_id:
+                return {
                     "row": idx + 2,
-                    "status": "OK" if resp and resp.ok else "ERROR",
-                    "code": resp.status_code if resp else None,
-                    "response": resp.text if resp else "No response"
-                })
-
-        except Exception as e:
-            logger.exception("Error procesando fila")
-            results.append({
+                    "status": "SKIP_NO_ID",
+                    "response": "No ID para eliminar"
+                }
+
+            resp = api_client.delete_terminals([term_id])
+            result = {
                 "row": idx + 2,
-                "status": "EXCEPTION",
-                "response": str(e)
-            })
+                "status": "OK" if resp.ok else "ERROR",
+                "code": resp.status_code,
+                "response": resp.text,
+                "action": "DELETE",
+                "id": term_id
+            }
+
+        elif tem is not None and not clean_id(row.get("id")):
+            # 🔥 Acción: Crear o actualizar terminal, buscando antes su ID por serial
+            result = plan_and_save(idx, serial, codigo_punto, tem)
 
+        else:
+            # 🔥 Acción: Crear o actualizar terminal
+            # Mismo cuerpo que TEMAutomation, serializado sobre la plantilla de core.endpoints
+            payload = encode_terminal(serial, codigo_punto, clean_id(row.get("id")))
+
+            # Los reintentos (429/503, Retry-After, backoff) los maneja el rate limiter del cliente
+            resp = api_client.save_or_update(payload)
+
+            result = {
+                "row": idx + 2,
+                "status": "OK" if resp and resp.ok else "ERROR",
+                "code": resp.status_code if resp else None,
+                "response": resp.text if resp else "No response",
+                "action": "UPSERT",
+                # saveOrUpdateTerminal responde el ID del terminal como string JSON
+                "id": resp.text.strip().strip('"') if resp is not None and resp.ok else None
+            }
+
+    except Exception as e:
+        logger.exception("Error procesando fila")
+        result = {
+            "row": idx + 2,
+            "status": "EXCEPTION",
+            "response": str(e)
+        }
+
+    if delay:
         time.sleep(delay)
+    return result
+
+
+def process_records(records, api_client, delay=0, max_workers=DEFAULT_MAX_WORKERS,
+                    delete_batch_size=DELETE_BATCH_SIZE, journal=None, tem=None):
+    """
+    Procesa registros normalizados (ver excel_processor.normalize_record) a medida
+    que llegan: las primeras peticiones salen mientras el archivo aún se está leyendo.
+
+    Genera un resultado por fila con las llaves "row", "serial", "status",
+    "response", "action" e "id". Las filas a eliminar se agrupan en lotes de
+    `delete_batch_size` IDs, por lo que su resultado sale cuando se envía el lote
+    (el campo "row" indica la fila original).
+
+    Con un `journal` (CheckpointJournal) las filas ya completadas en una
+    corrida anterior se omiten y cada resultado nuevo queda registrado.
+    Con `tem` las filas sin ID se resuelven por serial como en el GUI
+    (ver process_row); las eliminaciones siguen por api_client.
+    """
+    def tasks():
+        deletes = []
+        for rec in profiled_iter("ingest", records):
+            if journal is not None and journal.is_done(rec["row"]):
+                yield "done", [rec]
+            elif delete_batch_size > 1 and is_delete_row(rec) and rec.get("id"):
+                deletes.append(rec)
+                if len(deletes) >= delete_batch_size:
+                    yield "delete", deletes
+                    deletes = []
+            else:
+                yield "row", [rec]
+        if deletes:
+            yield "delete", deletes
+
+    def run(task):
+        kind, recs = task
+        if kind == "done":
+            entry = journal.get(recs[0]["row"])
+            results = [{"row": recs[0]["row"], "status": entry["status"], "action": entry["action"],
+                        "response": "Completado en una corrida anterior", "id": entry["id"]}]
+        elif kind == "delete":
+            results = delete_batch([(rec["row"] - 2, rec["id"]) for rec in recs], api_client)
+        elif recs[0].get("error"):
+            results = [{"row": recs[0]["row"], "status": "INVALID", "response": recs[0]["error"]}]
+        else:
+            results = [process_row(recs[0]["row"] - 2, recs[0], api_client, delay, tem)]
+        for rec, result in zip(recs, results):
+            result["serial"] = rec["SERIAL"]
+            # Solo se conserva un extracto del cuerpo (las páginas de error HTML son grandes)
+            result["response"] = compact_response(result.get("response"))
+        return kind, results
+
+    for kind, results in imap_ordered(run, tasks(), max_workers=max_workers):
+        for result in results:
+            if journal is not None and kind != "done":
+                journal.record(result["row"], result["serial"], result.get("action"),
+                               result.get("id"), result["status"])
+            METRICS.row_done()
+            yield result
+
+
+def process_dataframe(df, api_client, delay=0, max_retries=None, max_workers=DEFAULT_MAX_WORKERS,
+                      delete_batch_size=DELETE_BATCH_SIZE, journal=None, tem=None):
+    """
+    Procesa todas las filas del DataFrame con hasta `max_workers` peticiones
+    simultáneas y agrega las columnas Result/API_Response en el orden original.
+
+    El ritmo lo controla el rate limiter adaptativo del api_client; `delay`
+    solo se conserva para forzar una pausa fija adicional por fila.
+    Ver process_records para el agrupamiento de eliminaciones y el journal.
+
+    `max_retries` aplica solo a esta llamada: se usa una copia liviana del
+    cliente (misma sesión y limiter), así el compartido no cambia.
+    """
+    if max_retries is not None:
+        api_client = copy.copy(api_client)
+        api_client.max_retries = max_retries
+
+    # 🧾 Columnas preasignadas por posición: no se acumulan los dicts de resultado
+    status = [None] * len(df)
+    response = [None] * len(df)
+    for r in process_records(
+        dataframe_records(df), api_client, delay=delay, max_workers=max_workers,
+        delete_batch_size=delete_batch_size, journal=journal
+    ):
+        status[r["row"] - 2] = r["status"]
+        response[r["row"] - 2] = r["response"]
 
-    # 🧾 Guardar resultados en el DataFrame
-    df["Result"] = [r["status"] for r in results]
-    df["API_Response"] = [r["response"] for r in results]
+    df["Result"] = status
+    df["API_Response"] = response
     return df
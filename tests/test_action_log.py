@@ -0,0 +1,50 @@
+# tests/test_action_log.py
+import json
+
+import core.action_log as action_log
+from core.action_log import ActionLogger
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def make_logger(tmp_path, **kwargs):
+    return ActionLogger(str(tmp_path / "log.txt"), str(tmp_path / "log.jsonl"), flush_interval=0.01, **kwargs)
+
+
+def test_close_flushes_everything_in_order(tmp_path):
+    log = make_logger(tmp_path, batch_size=100)
+    for i in range(2500):
+        log.log("CREATE", f"S{i}", "OK")
+    log.close()
+
+    assert [r["serial"] for r in read_jsonl(tmp_path / "log.jsonl")] == [f"S{i}" for i in range(2500)]
+    with open(tmp_path / "log.txt", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 2500
+
+
+def test_failed_batch_is_kept_and_retried(tmp_path, monkeypatch):
+    real_append = action_log._append
+    failures = {"count": 2}
+
+    def flaky_append(path, data, max_bytes, backups):
+        if path.endswith(".jsonl") and failures["count"]:
+            failures["count"] -= 1
+            raise OSError("disco lleno")
+        real_append(path, data, max_bytes, backups)
+
+    monkeypatch.setattr(action_log, "_append", flaky_append)
+    log = make_logger(tmp_path)
+    log.log("CREATE", "A1", "OK")
+    log.flush()
+    log.log("UPDATE", "B2", "OK")
+    log.flush()
+    log.log("DELETE", "C3", "OK")
+    log.close()
+
+    assert [r["serial"] for r in read_jsonl(tmp_path / "log.jsonl")] == ["A1", "B2", "C3"]
+    # El destino que no falló no se repite
+    with open(tmp_path / "log.txt", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 3
@@ -0,0 +1,159 @@
+# tests/test_async_client.py
+import asyncio
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from core.async_client import AsyncAPIClient
+from core.endpoints import encode_terminal
+from core.metrics import MetricsRecorder
+from core.rate_limiter import AdaptiveRateLimiter
+from tools.mock_tem_server import CSRF_TOKEN, SESSION_COOKIE, MockTEMState, start_server
+
+
+def serve(**state_kwargs):
+    server, base_url, state = start_server(state=MockTEMState(**state_kwargs))
+    return server, f"{base_url}/emgui/rest/dms/terminals", state
+
+
+@pytest.fixture
+def mock_tem(request):
+    server, url, state = serve(**getattr(request, "param", {}))
+    yield url, state
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(url, csrf=CSRF_TOKEN, **kwargs):
+    kwargs.setdefault("rate_limiter", AdaptiveRateLimiter(rate=1000, max_rate=1000, burst=1000))
+    kwargs.setdefault("metrics", MetricsRecorder())
+    return AsyncAPIClient({SESSION_COOKIE: "mock-session"}, csrf, base_url=url, **kwargs)
+
+
+async def save_all(client, serials):
+    async with client:
+        return await asyncio.gather(*(client.save_or_update(encode_terminal(s)) for s in serials))
+
+
+class FakeSessionManager:
+    """Lo mínimo de SessionManager que usa el cliente para re-autenticar."""
+
+    def __init__(self):
+        self.generation = 0
+        self.refreshed = 0
+
+    def refresh(self, seen_generation=None):
+        self.refreshed += 1
+        self.generation += 1
+        return True
+
+    def get_csrf(self):
+        return CSRF_TOKEN
+
+    def get_session(self):
+        return SimpleNamespace(cookies=[SimpleNamespace(name=SESSION_COOKIE, value="mock-session")])
+
+
+@pytest.mark.parametrize("mock_tem", [{"latency": 0.2}], indirect=True)
+def test_requests_run_concurrently_up_to_max_concurrency(mock_tem):
+    url, state = mock_tem
+    client = make_client(url, max_concurrency=10)
+    started = time.monotonic()
+    resps = asyncio.run(save_all(client, [f"C{i}" for i in range(20)]))
+    elapsed = time.monotonic() - started
+
+    assert all(r.status_code == 200 for r in resps)
+    # 20 peticiones de 0.2 s con 10 en vuelo: dos tandas, no veinte
+    assert 0.4 <= elapsed < 2.0
+    assert state.requests == 20
+
+
+@pytest.mark.parametrize("mock_tem", [{"jitter": 0.05}], indirect=True)
+def test_gather_keeps_input_order(mock_tem):
+    url, state = mock_tem
+    serials = [f"S{i}" for i in range(50)]
+    resps = asyncio.run(save_all(make_client(url), serials))
+
+    assert [r.json() for r in resps] == [state.by_signature[s] for s in serials]
+
+
+@pytest.mark.parametrize("mock_tem", [{"error_rate": 1.0}], indirect=True)
+def test_server_error_is_returned_and_recorded(mock_tem):
+    url, state = mock_tem
+    metrics = MetricsRecorder()
+    resps = asyncio.run(save_all(make_client(url, max_retries=2, metrics=metrics), ["E1", "E2"]))
+
+    # 500 no está en RETRY_STATUSES: se devuelve tal cual, sin reintentar
+    assert [r.status_code for r in resps] == [500, 500]
+    assert state.requests == 2
+    stats = metrics.summary()["endpoints"]["saveOrUpdateTerminal"]
+    assert stats["statuses"] == {500: 2} and stats["retries"] == 0
+
+
+@pytest.mark.parametrize("mock_tem", [{"throttle_rate": 1.0, "retry_after": 0}], indirect=True)
+def test_throttling_slows_the_shared_limiter(mock_tem):
+    url, state = mock_tem
+    limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, burst=1000)
+    resps = asyncio.run(save_all(make_client(url, rate_limiter=limiter, max_retries=3), ["T1"]))
+
+    assert resps[0].status_code == 429
+    assert state.requests == 4
+    assert limiter.rate < 1000
+
+
+def test_bad_csrf_is_not_retried(mock_tem):
+    url, state = mock_tem
+    resps = asyncio.run(save_all(make_client(url, csrf="expirado"), ["A1"]))
+
+    assert resps[0].status_code == 403
+    assert state.requests == 1
+    assert state.by_signature == {}
+
+
+def test_expired_session_reauthenticates_once(mock_tem):
+    url, state = mock_tem
+    sm = FakeSessionManager()
+    resps = asyncio.run(save_all(make_client(url, csrf="expirado", session_manager=sm), ["R1"]))
+
+    assert resps[0].status_code == 200
+    assert sm.refreshed == 1
+    assert resps[0].json() == state.by_signature["R1"]
+
+
+def test_unreachable_server_raises_after_retries():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    metrics = MetricsRecorder()
+    client = make_client(f"http://127.0.0.1:{port}/emgui/rest/dms/terminals", max_retries=1, metrics=metrics)
+
+    with pytest.raises(aiohttp.ClientError):
+        asyncio.run(save_all(client, ["X1"]))
+    assert metrics.summary()["endpoints"]["saveOrUpdateTerminal"]["retries"] == 1
+
+
+async def delete_all(client, batches):
+    async with client:
+        return [await client.delete_terminals(ids) for ids in batches]
+
+
+def test_delete_format_is_detected_once(mock_tem):
+    url, state = mock_tem
+    client = make_client(url)
+    resps = asyncio.run(delete_all(client, [["id:1"], ["id:2"], ["id:3"]]))
+
+    assert [r.status_code for r in resps] == [200, 200, 200]
+    assert client.delete_format == "list" and state.requests == 3
+
+
+@pytest.mark.parametrize("mock_tem", [{"error_rate": 1.0}], indirect=True)
+def test_known_delete_format_does_not_retry_the_other_one(mock_tem):
+    url, state = mock_tem
+    resps = asyncio.run(delete_all(make_client(url, delete_format="list"), [["id:1"]]))
+
+    assert resps[0].status_code == 500
+    assert state.requests == 1
@@ -0,0 +1,27 @@
+# tests/test_auth_cache.py
+import json
+import os
+import time
+
+from core.auth_cache import cache_path, save_auth_state, load_auth_state
+
+COOKIES = [{"name": "JSESSIONID", "value": "abc", "domain": "tem", "path": "/", "expires": -1}]
+
+
+def test_cache_holds_the_session_and_nothing_about_the_password(tmp_path):
+    path = cache_path("Usuario", str(tmp_path))
+    save_auth_state(path, COOKIES, "csrf")
+
+    state = load_auth_state(cache_path(" usuario ", str(tmp_path)))
+    assert state["cookies"][0]["value"] == "abc" and state["csrf_token"] == "csrf"
+    assert set(state) == {"cookies", "csrf_token", "saved_at", "expires_at"}
+
+
+def test_legacy_cache_with_password_verifier_is_deleted(tmp_path):
+    path = cache_path("usuario", str(tmp_path))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"cookies": COOKIES, "csrf_token": "csrf", "salt": "00", "verifier": "ff",
+                   "expires_at": time.time() + 60}, f)
+
+    assert load_auth_state(path) is None
+    assert not os.path.exists(path)
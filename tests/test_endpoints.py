@@ -0,0 +1,54 @@
+# tests/test_endpoints.py
+import json
+
+import pytest
+
+from core import endpoints
+from core.endpoints import dumps, encode_delete, encode_search, encode_terminal, search_payload, terminal_payload
+
+CASES = [
+    ("AB12", None, None),
+    ("AB12", "P-100", "-2087f8da:19a:-7ff1:AC1A"),
+    ("ÑANDÚ-7", "Punto Café ☕", None),
+    ('SER"1', 'Local "El Sol"', 'id"x'),
+    ("S\\2", "tab\tnueva\nlínea", None),
+    ("\x00id\x00", "\x00name\x00", None),   # los marcadores internos de la plantilla
+]
+
+
+@pytest.fixture(params=["stdlib", "orjson"])
+def serializer(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(endpoints, "orjson", None)
+        # La plantilla se cortó al importar con orjson (si estaba): se rearma con json
+        monkeypatch.setattr(endpoints, "_PUT_PARTS", endpoints._split_template())
+    return request.param
+
+
+@pytest.mark.parametrize("serial, name, term_id", CASES)
+def test_encode_terminal_equals_serializing_the_payload(serializer, serial, name, term_id):
+    body = encode_terminal(serial, name, term_id)
+    assert body == dumps(terminal_payload(serial, name, term_id))
+    decoded = json.loads(body)["terminalAndGeolocation"]
+    assert (decoded["signature"], decoded["name"], decoded["id"]) == (serial, name or serial, term_id)
+
+
+def test_folder_search_body_is_prebuilt():
+    assert encode_search() is encode_search()
+    assert json.loads(encode_search()) == search_payload()
+    assert json.loads(encode_search("AB12"))["criteriaAndList"][0] == {"key": {"header": "SIGNATURE"},
+                                                                         "value": "AB12"}
+
+
+def test_delete_bodies():
+    assert json.loads(encode_delete(["a", "b"])) == ["a", "b"]
+    assert json.loads(encode_delete(["a"], "ids")) == {"ids": ["a"]}
+
+
+def test_headers_are_read_only():
+    headers = endpoints.auth_headers("tok")
+    assert headers["x-csrf-token"] == "tok"
+    with pytest.raises(TypeError):
+        headers["x-csrf-token"] = "otro"
@@ -0,0 +1,75 @@
+# tests/test_excel_processor.py
+import pytest
+
+pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+
+from core.excel_processor import iter_records
+
+ROWS = [
+    ("SERIAL", "CODIGO_PUNTO", "ACTION", "ID"),
+    ("A1", 1234.0, None, None),
+    (None, "P2", None, None),
+    (None, None, None, None),
+    (None, None, "delete", "id:9"),
+    ("Ñ5", "Punto; Sur", None, None),
+]
+
+
+def summary(path):
+    return [(r["row"], r["SERIAL"], r["CODIGO_PUNTO"], r["action"], r["id"], r["error"])
+            for r in iter_records(str(path))]
+
+
+EXPECTED = [
+    (2, "A1", "1234", "upsert", None, None),
+    (3, "", "P2", "upsert", None, "SERIAL vacío"),
+    (5, "", "", "delete", "id:9", None),
+    (6, "Ñ5", "Punto; Sur", "upsert", None, None),
+]
+
+
+def test_xlsx_streams_normalized_records(tmp_path):
+    path = tmp_path / "equipos.xlsx"
+    wb = openpyxl.Workbook()
+    for row in ROWS:
+        wb.active.append(row)
+    wb.save(path)
+
+    assert summary(path) == EXPECTED
+
+
+def write_csv(path, delimiter, encoding):
+    lines = []
+    for row in ROWS:
+        cells = ["" if v is None else str(v) for v in row]
+        lines.append(delimiter.join(f'"{c}"' if delimiter in c else c for c in cells))
+    path.write_bytes(("\r\n".join(lines) + "\r\n").encode(encoding))
+
+
+@pytest.mark.parametrize("delimiter, encoding", [
+    (",", "utf-8"),
+    (",", "utf-8-sig"),
+    (";", "cp1252"),     # Excel en configuración regional española
+    ("\t", "utf-8"),
+])
+def test_csv_delimiter_and_encoding_are_detected(tmp_path, delimiter, encoding):
+    path = tmp_path / "equipos.csv"
+    write_csv(path, delimiter, encoding)
+
+    assert summary(path) == EXPECTED
+
+
+def test_csv_with_lowercase_semicolon_header(tmp_path):
+    path = tmp_path / "equipos.csv"
+    path.write_bytes("serial;codigo_punto\nB2;Café\n".encode("cp1252"))
+
+    assert summary(path) == [(2, "B2", "Café", "upsert", None, None)]
+
+
+def test_missing_columns_are_reported(tmp_path):
+    path = tmp_path / "equipos.csv"
+    path.write_text("SERIAL,PUNTO\nA1,P1\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="CODIGO_PUNTO"):
+        list(iter_records(str(path)))
@@ -0,0 +1,69 @@
+# tests/test_jobs.py
+import os
+
+import pytest
+
+from core.jobs import JobStore, QUEUED
+from core.journal import CheckpointJournal
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs"))
+
+
+@pytest.fixture
+def sheet(tmp_path):
+    path = tmp_path / "equipos.csv"
+    path.write_text("SERIAL,CODIGO_PUNTO\nA1,P1\nB2,P2\n", encoding="utf-8")
+    return str(path)
+
+
+def test_same_sheet_twice_gets_separate_journals(store, sheet):
+    first = store.submit(sheet)
+    second = store.submit(sheet)
+    with CheckpointJournal(store.journal_path(first["id"])) as journal:
+        journal.record(2, "A1", "CREATE", "id:1", "OK")
+
+    assert store.journal_path(first["id"]) != store.journal_path(second["id"])
+    with CheckpointJournal(store.journal_path(second["id"])) as journal:
+        assert not journal.is_done(2)
+
+
+def test_resume_starts_from_previous_job_journal(store, sheet):
+    first = store.submit(sheet)
+    with CheckpointJournal(store.journal_path(first["id"])) as journal:
+        journal.record(2, "A1", "CREATE", "id:1", "OK")
+
+    resumed = store.submit(sheet, resume=first["id"])
+    assert resumed["resumed_from"] == first["id"] and resumed["status"] == QUEUED
+    with CheckpointJournal(store.journal_path(resumed["id"])) as journal:
+        assert journal.is_done(2) and not journal.is_done(3)
+
+
+def test_resume_requires_a_known_job(store, sheet):
+    with pytest.raises(KeyError):
+        store.submit(sheet, resume="no-existe")
+    assert [name for name in os.listdir(store.files_dir)] == []
+
+
+def test_update_with_expect_is_compare_and_swap(store, sheet):
+    job = store.submit(sheet)
+    assert store.cancel(job["id"])
+    # El scheduler eligió el trabajo antes del cancel: el claim ya no aplica
+    assert store.update(job["id"], expect=(QUEUED,), status="RUNNING") is None
+    assert store.get(job["id"])["status"] == "CANCELLED"
+    assert not store.cancel(job["id"])
+
+
+def test_scan_inbox_waits_until_file_is_stable(store, tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    path = inbox / "lote.csv"
+    path.write_text("SERIAL,CODIGO_PUNTO\nA1,P1\n", encoding="utf-8")
+
+    assert store.scan_inbox(str(inbox), min_age=0) == []      # primera vez que se ve
+    path.write_text("SERIAL,CODIGO_PUNTO\nA1,P1\nB2,P2\n", encoding="utf-8")
+    assert store.scan_inbox(str(inbox), min_age=0) == []      # siguió creciendo
+    jobs = store.scan_inbox(str(inbox), min_age=0)
+    assert len(jobs) == 1 and not path.exists()
@@ -0,0 +1,21 @@
+# tests/test_journal.py
+import os
+
+from core.journal import CheckpointJournal
+
+
+def test_rotate_archives_the_previous_run_and_starts_empty(tmp_path):
+    source = tmp_path / "equipos.xlsx"
+    source.write_bytes(b"contenido")
+    journal = CheckpointJournal.for_input(str(source), directory=str(tmp_path / "journal"), fsync=False)
+    journal.record(2, "A1", "CREATE", "id:1", "OK")
+
+    archived = journal.rotate()
+    journal.record(3, "B2", "UPDATE", "id:2", "OK")
+    journal.close()
+
+    assert os.path.exists(archived) and not journal.is_done(2)
+    with CheckpointJournal.for_input(str(source), directory=str(tmp_path / "journal")) as reopened:
+        assert [e["row"] for e in reopened.entries()] == [3]
+    with CheckpointJournal(archived) as previous:
+        assert previous.is_done(2)
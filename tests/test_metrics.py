@@ -0,0 +1,61 @@
+# tests/test_metrics.py
+from core.metrics import LATENCY_BUCKETS, MetricsRecorder, endpoint_name
+
+
+def recorder():
+    m = MetricsRecorder()
+    for i in range(1, 101):                      # 0.01 s … 1.00 s
+        m.observe("saveOrUpdateTerminal", 200, i / 100)
+    m.observe("saveOrUpdateTerminal", 503, 0.2)
+    m.observe("terminalLights", "ConnectionError", 0.3)
+    m.retry("saveOrUpdateTerminal")
+    m.wait(1.5)
+    m.row_done(3)
+    return m
+
+
+def test_percentiles_and_status_counts():
+    s = recorder().summary()["endpoints"]["saveOrUpdateTerminal"]
+
+    assert s["count"] == 101 and s["retries"] == 1
+    assert s["statuses"] == {200: 100, 503: 1}
+    assert (s["p50"], s["p95"], s["p99"]) == (0.5, 0.95, 0.99)
+
+
+def test_prometheus_text_format():
+    text = recorder().to_prometheus()
+    lines = text.splitlines()
+
+    assert text.endswith("\n")
+    for metric, kind in [("tem_request_duration_seconds", "histogram"), ("tem_requests_total", "counter"),
+                         ("tem_retries_total", "counter"), ("tem_rows_total", "counter"),
+                         ("tem_throttle_wait_seconds_total", "counter")]:
+        assert f"# TYPE {metric} {kind}" in lines
+
+    buckets = [line for line in lines
+               if line.startswith('tem_request_duration_seconds_bucket{endpoint="saveOrUpdateTerminal"')]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts) and counts[-1] == 101          # acumulativo, +Inf = total
+    assert buckets[-1].startswith('tem_request_duration_seconds_bucket{endpoint="saveOrUpdateTerminal",le="+Inf"}')
+    # le="0.05": 0.01 … 0.05
+    assert 'tem_request_duration_seconds_bucket{endpoint="saveOrUpdateTerminal",le="0.05"} 5' in lines
+    assert 'tem_request_duration_seconds_count{endpoint="saveOrUpdateTerminal"} 101' in lines
+    assert 'tem_requests_total{endpoint="saveOrUpdateTerminal",status="503"} 1' in lines
+    assert 'tem_requests_total{endpoint="terminalLights",status="ConnectionError"} 1' in lines
+    assert 'tem_retries_total{endpoint="saveOrUpdateTerminal"} 1' in lines
+    assert "tem_rows_total 3" in lines
+    assert "tem_throttle_wait_seconds_total 1.500000" in lines
+
+
+def test_write_prometheus_replaces_the_file(tmp_path):
+    path = tmp_path / "logs" / "metrics.prom"
+    m = recorder()
+    m.write_prometheus(str(path))
+
+    assert path.read_text(encoding="utf-8") == m.to_prometheus()
+    assert [p.name for p in path.parent.iterdir()] == ["metrics.prom"]
+
+
+def test_endpoint_name_is_the_last_path_segment():
+    assert endpoint_name("https://tem/emgui/rest/dms/terminals/terminalLights/?full=false&start=0") == "terminalLights"
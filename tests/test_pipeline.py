@@ -0,0 +1,73 @@
+# tests/test_pipeline.py
+import threading
+import time
+
+import pytest
+
+from core.pipeline import Pipeline
+
+
+def slow(x):
+    time.sleep(0.02)
+    return x
+
+
+def same(x):
+    return x
+
+
+def pipeline_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("pipeline")]
+
+
+def wait_for_threads(timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while pipeline_threads() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return pipeline_threads()
+
+
+def test_results_keep_input_order():
+    pipeline = Pipeline([("a", same, 4), ("b", slow, 4)])
+    assert [value for _, value in pipeline.run(range(100))] == list(range(100))
+
+
+def test_stage_error_only_affects_its_row():
+    def boom(x):
+        if x == 3:
+            raise RuntimeError("fila 3")
+        return x
+
+    results = [value for _, value in Pipeline([("a", boom, 2), ("b", same, 2)]).run(range(6))]
+    assert isinstance(results[3], RuntimeError)
+    assert results[:3] + results[4:] == [0, 1, 2, 4, 5]
+
+
+def test_failing_input_yields_read_rows_then_raises():
+    def rows():
+        yield 1
+        yield 2
+        raise ValueError("fila mala")
+
+    seen = []
+    with pytest.raises(ValueError, match="fila mala"):
+        for _, value in Pipeline([("a", same, 2)]).run(rows()):
+            seen.append(value)
+    assert seen == [1, 2]
+    assert wait_for_threads() == []
+
+
+def test_early_close_releases_blocked_workers():
+    results = Pipeline([("a", slow, 4), ("b", same, 2)], queue_size=2).run(range(1000))
+    next(results)
+    results.close()
+    assert wait_for_threads() == []
+
+
+def test_slow_stage_gets_more_threads_than_fast_one():
+    pipeline = Pipeline([("lookup", same, 8), ("validate", slow, 8), ("write", slow, 8)],
+                        rebalance_every=0.05)
+    list(pipeline.run(range(200)))
+    stats = pipeline.stage_stats()
+    assert stats["validate"]["workers"] == stats["write"]["workers"] == 8
+    assert stats["lookup"]["workers"] < 8
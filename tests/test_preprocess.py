@@ -0,0 +1,72 @@
+# tests/test_preprocess.py
+import os
+import time
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from core.preprocess import prepare_dataframe
+
+
+def sheet():
+    return pd.DataFrame({
+        "SERIAL": ["A1", "", "", "B2", "A1.0", None],
+        "CODIGO_PUNTO": [1234.0, "P2", "P3", "P4", "P5", "P6"],
+        "ACTION": ["", "delete", "delete", "delete", "", ""],
+        "ID": ["", "id:9", "", "id:2", "", ""],
+    })
+
+
+def test_delete_paths_accept_blank_serial_only_with_id():
+    valid, invalid, report = prepare_dataframe(sheet())
+
+    assert list(valid.index) == [1, 3, 4]
+    assert dict(invalid["ISSUE"]) == {
+        0: "SERIAL duplicado (se usa la última fila)", 2: "SERIAL vacío", 5: "SERIAL vacío"}
+    assert report["blank_serial"] == 2 and report["deletes_rejected"] == 0
+
+
+def test_upsert_only_paths_reject_every_delete_and_blank_serial():
+    valid, invalid, report = prepare_dataframe(sheet(), deletes=False)
+
+    assert list(valid.index) == [4]
+    assert valid.loc[4, "SERIAL"] == "A1"
+    assert invalid.loc[1, "ISSUE"] == "SERIAL vacío"
+    assert invalid.loc[3, "ISSUE"] == "Eliminación no soportada en este flujo"
+    assert report["blank_serial"] == 3 and report["deletes_rejected"] == 1
+
+
+def big_sheet(n):
+    return pd.DataFrame({
+        "SERIAL": [f"SER{i}" if i % 50 else "" for i in range(n)],
+        "CODIGO_PUNTO": [float(i) for i in range(n)],
+        "ACTION": ["delete" if i % 97 == 0 else "" for i in range(n)],
+    })
+
+
+def test_validation_is_vectorized(monkeypatch):
+    def per_row(*args, **kwargs):
+        raise AssertionError("prepare_dataframe no debe recorrer la hoja fila por fila")
+
+    for cls, name in [(pd.DataFrame, "iterrows"), (pd.DataFrame, "itertuples"), (pd.DataFrame, "apply"),
+                      (pd.Series, "apply"), (pd.Series, "map"), (pd.Series, "__iter__")]:
+        monkeypatch.setattr(cls, name, per_row)
+    n = 5_000
+    valid, invalid, report = prepare_dataframe(big_sheet(n), deletes=False)
+
+    assert len(valid) + len(invalid) == n
+    assert report["blank_serial"] == n // 50 and report["normalized_serials"] == 0
+
+
+@pytest.mark.skipif(not os.environ.get("TEM_BENCHMARK"),
+                    reason="benchmark de tiempo: correr con TEM_BENCHMARK=1")
+def test_100k_rows_under_one_second():
+    n = 100_000
+    df = big_sheet(n)
+    started = time.perf_counter()
+    valid, invalid, report = prepare_dataframe(df, deletes=False)
+    elapsed = time.perf_counter() - started
+
+    assert len(valid) + len(invalid) == n
+    assert elapsed < 1.0, f"prepare_dataframe tardó {elapsed:.2f}s para {n} filas"
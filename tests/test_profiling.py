@@ -0,0 +1,67 @@
+# tests/test_profiling.py
+import threading
+import time
+
+from core.profiling import Profiler
+
+
+def busy():
+    return sum(i * i for i in range(20000))
+
+
+def profiled_run(profiler):
+    profiler.start(memory=False)
+    with profiler.stage("write"):
+        busy()
+    profiler.stop()
+    return profiler._stats()
+
+
+def test_profiler_can_run_twice_in_the_same_thread(tmp_path):
+    profiler = Profiler()
+    first = profiled_run(profiler)
+    second = profiled_run(profiler)
+
+    assert first is not None and second is not None
+    assert any(func[2] == "busy" for func in second.stats)
+    assert profiler._active == {}
+    assert profiler.report(str(tmp_path)).endswith("report.txt")
+
+
+def test_record_adds_a_stage_measured_before_start():
+    profiler = Profiler()
+    profiler.start(memory=False)
+    profiler.record("ingest", 1.5)
+    profiler.stop()
+
+    rows = {r["stage"]: r for r in profiler.stage_report()}
+    assert rows["ingest"]["seconds"] == 1.5 and rows["ingest"]["calls"] == 1
+
+
+def test_nested_calls_of_a_stage_count_once():
+    profiler = Profiler()
+    profiler.start(memory=False)
+    with profiler.stage("write"):
+        with profiler.stage("write"):
+            busy()
+        with profiler.stage("lookup"):
+            busy()
+    profiler.stop()
+
+    rows = {r["stage"]: r for r in profiler.stage_report()}
+    assert rows["write"]["calls"] == 1 and rows["lookup"]["calls"] == 1
+    assert rows["write"]["seconds"] >= rows["lookup"]["seconds"]
+
+
+def test_sampler_survives_a_stage_popped_mid_sample():
+    class Vanishing(list):
+        """Pila que parece no vacía pero ya no tiene tope: el hilo salió de la etapa."""
+        def __bool__(self):
+            return True
+
+    profiler = Profiler()
+    profiler.start(memory=False, interval=0.001)
+    profiler._stacks[threading.get_ident()] = Vanishing()
+    time.sleep(0.02)
+    assert profiler._sampler.is_alive()
+    profiler.stop()
@@ -0,0 +1,52 @@
+# tests/test_reconcile.py
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from core.preprocess import prepare_dataframe
+from core.reconcile import reconcile
+from core.snapshot import Snapshot, write_snapshot
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / "migracion.snap")
+    write_snapshot(path, [
+        {"id": "id:1", "signature": "A1", "name": "P1", "type": "AXIUMNX"},
+        {"id": "id:2", "signature": "B2", "name": "OTRO", "type": "AXIUMNX"},
+    ])
+    with Snapshot(path) as snap:
+        yield snap
+
+
+def test_classifies_each_row(snapshot):
+    df = pd.DataFrame({"SERIAL": ["A1", "B2", "C3", "D4"], "CODIGO_PUNTO": ["P1", "P2", "P3", "P4"]})
+    entries = [
+        {"row": 2, "serial": "A1", "action": "UPDATE", "id": "id:1", "status": "OK"},
+        {"row": 3, "serial": "B2", "action": "UPDATE", "id": "id:2", "status": "OK"},
+        {"row": 4, "serial": "C3", "action": "CREATE", "id": None, "status": "HTTP 500"},
+    ]
+    rec = reconcile(df, entries, snapshot)
+    assert list(rec["RECONCILIATION"]) == ["VERIFICADO", "NOMBRE_DISTINTO", "FALLIDO", "SIN_PROCESAR"]
+
+
+def test_blank_serial_deletes_keep_their_own_result(snapshot):
+    df = pd.DataFrame({"SERIAL": ["", ""], "CODIGO_PUNTO": ["", ""], "ACTION": ["delete", "delete"]})
+    entries = [
+        {"row": 2, "serial": "", "action": "DELETE", "id": "id:8", "status": "OK"},
+        {"row": 3, "serial": "", "action": "DELETE", "id": "id:9", "status": "ERROR"},
+    ]
+    rec = reconcile(df, entries, snapshot)
+    assert list(rec["JOURNAL_ID"]) == ["id:8", "id:9"]
+    assert list(rec["RECONCILIATION"]) == ["VERIFICADO", "FALLIDO"]
+
+
+def test_invalid_rows_are_listed_as_not_sent(snapshot):
+    raw = pd.DataFrame({"SERIAL": ["A1", "", "A1"], "CODIGO_PUNTO": ["X", "P9", "P1"]})
+    valid, invalid, _ = prepare_dataframe(raw)
+    entries = [{"row": 4, "serial": "A1", "action": "UPDATE", "id": "id:1", "status": "OK"}]
+
+    rec = reconcile(valid, entries, snapshot, invalid)
+    assert list(rec["ROW"]) == [2, 3, 4]
+    assert list(rec["RECONCILIATION"]) == ["NO_ENVIADO", "NO_ENVIADO", "VERIFICADO"]
+    assert rec["ISSUE"].notna().sum() == 2
@@ -0,0 +1,68 @@
+# tests/test_sharded_runner.py
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+
+from core.sharded_runner import merge_results, shard_of, split_input
+
+
+def write_results(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps({"row": row, "status": f"OK{row}", "response": f"resp {row}"}) + "\n")
+
+
+def merged(path):
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return [list(r) for r in wb.active.iter_rows(max_col=4, values_only=True)]
+    finally:
+        wb.close()
+
+
+@pytest.fixture
+def sheet(tmp_path):
+    path = tmp_path / "equipos.csv"
+    path.write_text("SERIAL;CODIGO_PUNTO\nA1;P1\nB2;P2\n;\nC3;P3\nD4;P4\n", encoding="utf-8")
+    return path
+
+
+def test_merge_lines_up_results_from_unordered_shards(tmp_path, sheet):
+    # Cada shard termina en su propio orden; la fila 4 (vacía) no tiene resultado
+    write_results(tmp_path / "result_0.jsonl", [6, 2])
+    write_results(tmp_path / "result_1.jsonl", [5, 3])
+    out = tmp_path / "salida.xlsx"
+    merge_results(str(sheet), [str(tmp_path / "result_1.jsonl"), str(tmp_path / "result_0.jsonl")], str(out))
+
+    assert merged(out) == [
+        ["SERIAL", "CODIGO_PUNTO", "Result", "API_Response"],
+        ["A1", "P1", "OK2", "resp 2"],
+        ["B2", "P2", "OK3", "resp 3"],
+        [None, None, None, None],
+        ["C3", "P3", "OK5", "resp 5"],
+        ["D4", "P4", "OK6", "resp 6"],
+    ]
+
+
+def test_missing_shard_leaves_its_rows_empty(tmp_path, sheet):
+    write_results(tmp_path / "result_0.jsonl", [2, 5])
+    out = tmp_path / "salida.xlsx"
+    merge_results(str(sheet), [str(tmp_path / "result_0.jsonl")], str(out))
+
+    assert [row[2] for row in merged(out)[1:]] == ["OK2", None, None, "OK5", None]
+
+
+def test_split_is_stable_by_serial_and_keeps_sheet_rows(tmp_path, sheet):
+    paths = split_input(str(sheet), 3, str(tmp_path / "shards"))
+    shards = {}
+    for k, path in enumerate(paths):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                shards[rec["row"]] = k
+                assert k == shard_of(rec["SERIAL"], 3)
+
+    assert sorted(shards) == [2, 3, 5, 6]
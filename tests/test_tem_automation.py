@@ -0,0 +1,47 @@
+# tests/test_tem_automation.py
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.tem_automation import TEMAutomation
+from core.terminal_index import TerminalIndex
+
+
+@pytest.fixture
+def tem(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # logs/ de la corrida de prueba
+    sm = SimpleNamespace(get_session=lambda: None, get_csrf=lambda: "csrf", auth_headers=lambda: {})
+    tem = TEMAutomation(sm)
+    tem.index = TerminalIndex()
+    tem.index.add({"id": "id:1", "signature": "A1", "name": "P1", "type": "AXIUMNX"})
+    tem.searches = []
+    monkeypatch.setattr(tem, "terminal_exists", lambda serial: tem.searches.append(serial))
+    yield tem
+    tem.action_log.flush()  # el hilo escritor debe terminar antes de volver al cwd original
+
+
+def test_complete_index_miss_is_create_without_search(tem):
+    tem.index_synced = time.time()
+    report = tem.dry_run_report([("A1", "P1"), ("N1", None), ("N2", None)])
+
+    assert report == {"CREATE": 2, "UPDATE": 0, "UNCHANGED": 1}
+    assert tem.searches == []
+
+
+def test_partial_index_miss_falls_back_to_search(tem):
+    tem.index_synced = None
+    assert tem.plan_terminal("N1") == ("CREATE", None)
+    assert tem.searches == ["N1"]
+
+
+def test_snapshot_write_error_keeps_the_downloaded_index(tem, monkeypatch):
+    def disk_full(*args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("core.tem_automation.save_index_snapshot", disk_full)
+    monkeypatch.setattr(tem, "iter_folder_terminals", lambda *a: iter([{"id": "id:2", "signature": "B2"}]))
+
+    assert tem.prefetch_index(snapshot_path="logs/snapshot/migracion.snap") == 1
+    assert tem.index.get_id("B2") == "id:2"
+    assert tem.index_synced is not None
@@ -0,0 +1,116 @@
+# tests/test_validation_cache.py
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from core import validation_cache
+from core.validation_cache import ValidationCache, parse_validation
+
+
+def response(text, status=200):
+    return SimpleNamespace(ok=status < 400, status_code=status, text=text, json=lambda: json.loads(text))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(validation_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hit_is_keyed_by_normalized_signature(clock):
+    cache = ValidationCache()
+    cache.set(" ab12 ", True)
+
+    assert cache.get("AB12") is True
+    assert cache.get("CD34") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ValidationCache(ttl=60)
+    cache.set("AB12", True)
+
+    clock[0] += 59
+    assert cache.get("AB12") is True
+    clock[0] += 2
+    assert cache.get("AB12") is None and len(cache) == 0
+
+
+def test_negative_results_are_cached_too(clock):
+    cache = ValidationCache()
+    cache.set("AB12", False)
+
+    assert cache.get("AB12") is False
+
+
+def test_size_is_bounded_by_least_recently_used(clock):
+    cache = ValidationCache(maxsize=2)
+    cache.set("A", True)
+    cache.set("B", True)
+    cache.get("A")
+    cache.set("C", False)
+
+    assert len(cache) == 2
+    assert cache.get("B") is None and cache.get("A") is True and cache.get("C") is False
+
+
+@pytest.mark.parametrize("text, status, expected", [
+    ("true", 200, True),
+    ("false", 200, False),
+    ("", 200, True),
+    ('{"valid": false}', 200, False),
+    ('{"errors": ["en uso"]}', 200, False),
+    ("True", 200, True),
+    ("<html>", 200, None),
+    ("true", 500, None),
+])
+def test_parse_validation(text, status, expected):
+    assert parse_validation(response(text, status)) is expected
+
+
+@pytest.fixture
+def tem(tmp_path, monkeypatch):
+    from core.tem_automation import TEMAutomation
+
+    monkeypatch.chdir(tmp_path)
+    sm = SimpleNamespace(get_session=lambda: None, get_csrf=lambda: "csrf", auth_headers=lambda: {})
+    tem = TEMAutomation(sm)
+    tem.calls = []
+    tem.answers = {}
+
+    def request(method, url, **kwargs):
+        tem.calls.append(method)
+        if method == "GET":
+            return response(tem.answers[kwargs["params"]["signature"]])
+        return response('"id:nuevo"')
+
+    monkeypatch.setattr(tem, "_request", request)
+    monkeypatch.setattr(tem, "resolve_terminal_id", lambda serial: None)
+    yield tem
+    tem.action_log.flush()  # el hilo escritor debe terminar antes de volver al cwd original
+
+
+def test_repeated_validation_is_served_from_cache(tem):
+    tem.answers["AB12"] = "true"
+
+    assert tem.validate_signature("AB12") is True
+    assert tem.validate_signature("ab12") is True
+    assert tem.calls == ["GET"]
+
+
+def test_invalid_signature_is_skipped_without_put_on_every_retry(tem):
+    tem.answers["AB12"] = "false"
+
+    first = tem.upsert_terminal("AB12", "P1")
+    second = tem.upsert_terminal("AB12", "P1")
+
+    assert first["status"] == second["status"] == "INVALID_SIGNATURE"
+    assert tem.calls == ["GET"]
+
+
+def test_successful_create_keeps_a_positive_entry(tem):
+    tem.answers["AB12"] = ""      # cuerpo vacío: válido
+
+    assert tem.upsert_terminal("AB12", "P1")["ok"]
+    assert tem.validation_cache.get("AB12") is True
@@ -0,0 +1,114 @@
+# tests/test_worker.py
+from types import SimpleNamespace
+
+import pytest
+
+from core.worker import delete_batch
+
+
+class FakeDeleteClient:
+    """deleteTerminals que rechaza con `status` todo lote que contenga un ID de `bad`."""
+
+    def __init__(self, bad=(), status=400, raises=None):
+        self.bad = set(bad)
+        self.status = status
+        self.raises = raises
+        self.calls = 0
+
+    def delete_terminals(self, ids):
+        self.calls += 1
+        if self.raises:
+            raise self.raises
+        code = self.status if self.bad & set(ids) else 200
+        return SimpleNamespace(ok=code < 400, status_code=code, text="{}" if code < 400 else "rechazado")
+
+
+def entries(n):
+    return [(i, f"id:{i}") for i in range(n)]
+
+
+def test_rejected_id_is_isolated_by_bisection():
+    client = FakeDeleteClient(bad={"id:5"})
+    results = delete_batch(entries(8), client)
+
+    assert [r["status"] for r in results] == ["OK"] * 5 + ["ERROR"] + ["OK"] * 2
+    assert [r["row"] for r in results] == list(range(2, 10))
+
+
+@pytest.mark.parametrize("status", [500, 503, 429, 401, 403])
+def test_systemic_error_fails_whole_batch_without_bisecting(status):
+    client = FakeDeleteClient(bad={f"id:{i}" for i in range(50)}, status=status)
+    results = delete_batch(entries(50), client)
+
+    assert client.calls == 1
+    assert {r["status"] for r in results} == {"ERROR"} and len(results) == 50
+
+
+def test_network_error_fails_whole_batch_once():
+    client = FakeDeleteClient(raises=ConnectionError("sin red"))
+    results = delete_batch(entries(50), client)
+
+    assert client.calls == 1
+    assert {r["status"] for r in results} == {"EXCEPTION"} and len(results) == 50
+
+
+def test_max_retries_applies_only_to_the_call():
+    pd = pytest.importorskip("pandas")
+    from core.worker import process_dataframe
+
+    seen = []
+
+    class Client:
+        max_retries = 3
+
+        def save_or_update(self, body):
+            seen.append(self.max_retries)
+            return SimpleNamespace(ok=True, status_code=200, text='"id:1"')
+
+    client = Client()
+    df = process_dataframe(pd.DataFrame({"SERIAL": ["A1"], "CODIGO_PUNTO": ["P1"]}), client, max_retries=0)
+
+    assert seen == [0] and client.max_retries == 3
+    assert list(df["Result"]) == ["OK"]
+
+
+def test_rows_without_id_are_planned_against_the_index(tmp_path, monkeypatch):
+    import json
+    import time
+    from core.tem_automation import TEMAutomation
+    from core.terminal_index import TerminalIndex
+    from core.worker import process_records
+
+    monkeypatch.chdir(tmp_path)
+    sm = SimpleNamespace(get_session=lambda: None, get_csrf=lambda: "csrf", auth_headers=lambda: {})
+    tem = TEMAutomation(sm, skip_unchanged=True)
+    tem.index = TerminalIndex()
+    tem.index.add({"id": "id:1", "signature": "A1", "name": "P1", "type": "AXIUMNX"})
+    tem.index.add({"id": "id:2", "signature": "B2", "name": "viejo", "type": "AXIUMNX"})
+    tem.index_synced = time.time()
+    sent = []
+
+    def request(method, url, **kwargs):
+        sent.append((method, json.loads(kwargs["data"]) if "data" in kwargs else None))
+        body = "true" if method == "GET" else '"id:nuevo"'
+        return SimpleNamespace(ok=True, status_code=200, text=body, json=lambda: json.loads(body))
+
+    monkeypatch.setattr(tem, "_request", request)
+
+    class DirectClient:
+        def save_or_update(self, body):
+            sent.append(("DIRECT", json.loads(body)))
+            return SimpleNamespace(ok=True, status_code=200, text='"id:9"')
+
+    records = [{"row": r, "SERIAL": s, "CODIGO_PUNTO": p, "action": "upsert", "id": i, "error": None}
+               for r, s, p, i in [(2, "A1", "P1", None), (3, "B2", "P2", None),
+                                  (4, "N1", "P3", None), (5, "C3", "P4", "id:9")]]
+    results = list(process_records(records, DirectClient(), max_workers=1, tem=tem))
+    tem.action_log.flush()  # el hilo escritor debe terminar antes de volver al cwd original
+
+    assert [(r["status"], r["action"], r["id"]) for r in results] == [
+        ("UNCHANGED", "UNCHANGED", "id:1"), ("OK", "UPDATE", "id:2"),
+        ("OK", "CREATE", "id:nuevo"), ("OK", "UPSERT", "id:9")]
+    puts = [(kind, body["terminalAndGeolocation"]["id"]) for kind, body in sent if body]
+    assert puts == [("PUT", "id:2"), ("PUT", None), ("DIRECT", "id:9")]
+    assert [kind for kind, _ in sent].count("GET") == 1    # solo la creación se valida
@@ -0,0 +1,173 @@
+# tools/benchmark.py
+"""
+Benchmark reproducible contra el mock local del TEM (sin tocar producción).
+
+    python -m tools.benchmark --sizes 1000 10000 100000 --workers 8 --latency 0.005
+
+Mide filas/s, memoria y CPU por fila para TEMAutomation (búsqueda +
+validación + PUT) y para process_dataframe (APIClient). El escenario
+payload_encoding mide solo el armado y serialización del cuerpo del PUT
+(plantilla de core.endpoints contra dict + json.dumps), sin red.
+Con --json agrega una línea por escenario. Con --profile cada escenario deja
+su reporte por etapas (core.profiling) en logs/profile/bench_<escenario>_<filas>/.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from tools.mock_tem_server import MockTEMState, start_server, SESSION_COOKIE
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _session(base_url):
+    """SessionManager autenticado contra el mock sin abrir Chromium."""
+    from core.session_manager import SessionManager
+    sm = SessionManager()
+    sm.session.cookies.set(SESSION_COOKIE, "bench")
+    if not sm.fetch_csrf():
+        raise RuntimeError(f"El mock en {base_url} no entregó CSRF")
+    return sm
+
+
+def _limiter():
+    # Sin techo práctico: se mide el cliente, no el rate limit por defecto
+    from core.rate_limiter import AdaptiveRateLimiter
+    return AdaptiveRateLimiter(rate=1000, max_rate=100000, latency_target=10)
+
+
+def bench_tem_automation(base_url, rows, workers):
+    from core.engine import imap_ordered
+    from core.tem_automation import TEMAutomation
+
+    tem = TEMAutomation(_session(base_url), rate_limiter=_limiter())
+    tem.prefetch_index()
+    items = ((f"BENCH{i}", f"P{i}") for i in range(rows))
+    ok = sum(1 for r in imap_ordered(lambda it: tem.create_or_update_terminal(*it), items, workers) if r)
+    tem.action_log.flush()
+    return ok
+
+
+def bench_process_dataframe(base_url, rows, workers):
+    import pandas as pd
+    from core.api_client import APIClient
+    from core.worker import process_dataframe
+
+    sm = _session(base_url)
+    api = APIClient(sm.get_session(), sm.get_csrf(), rate_limiter=_limiter())
+    df = pd.DataFrame({"SERIAL": [f"DF{i}" for i in range(rows)],
+                       "CODIGO_PUNTO": [float(i) for i in range(rows)]})
+    out = process_dataframe(df, api, max_workers=workers)
+    return int((out["Result"] == "OK").sum())
+
+
+def bench_payload_encoding(base_url, rows, workers):
+    from core.endpoints import encode_terminal, terminal_payload
+
+    started = time.process_time()
+    for i in range(rows):
+        json.dumps(terminal_payload(f"ENC{i}", f"P{i}")).encode("utf-8")
+    baseline = time.process_time() - started
+    started = time.process_time()
+    for i in range(rows):
+        encode_terminal(f"ENC{i}", f"P{i}")
+    templated = time.process_time() - started
+    print(f"  dict + json.dumps: {baseline / rows * 1e6:.2f} µs/fila | "
+          f"plantilla: {templated / rows * 1e6:.2f} µs/fila")
+    return rows
+
+
+SCENARIOS = {
+    "tem_automation": bench_tem_automation,
+    "process_dataframe": bench_process_dataframe,
+    "payload_encoding": bench_payload_encoding,
+}
+
+
+def run(sizes, workers, scenarios, state_kwargs, seed, profile=False):
+    results = []
+    for name in scenarios:
+        for rows in sizes:
+            state = MockTEMState(**state_kwargs)
+            state.seed(seed)
+            server, base_url, _ = start_server(state=state)
+            os.environ["TEM_BASE_URL"] = base_url
+            _reload_core()
+            from core.profiling import PROFILER
+            if profile:
+                PROFILER.start(memory=False)  # la memoria ya la mide tracemalloc abajo
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            ok = SCENARIOS[name](base_url, rows, workers)
+            cpu = time.process_time() - cpu_started
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            server.shutdown()
+            if profile:
+                print(f"  perfilado: {PROFILER.report(os.path.join('logs', 'profile', f'bench_{name}_{rows}'))}")
+
+            results.append({
+                "scenario": name,
+                "rows": rows,
+                "workers": workers,
+                "ok": ok,
+                "seconds": round(elapsed, 2),
+                "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+                # Incluye el CPU del mock (mismo proceso): sirve para comparar corridas, no como absoluto
+                "cpu_us_per_row": round(cpu / rows * 1e6, 1),
+                "server_requests": state.requests,
+                "py_peak_mb": round(peak / (1024 * 1024), 1),
+                "rss_peak_mb": _peak_rss_mb()
+            })
+            print(json.dumps(results[-1]))
+    return results
+
+
+def _reload_core():
+    """Las URLs se arman al importar: recargar core con el TEM_BASE_URL del mock."""
+    for mod in [m for m in sys.modules if m == "core" or m.startswith("core.")]:
+        del sys.modules[mod]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark contra el mock local del TEM")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0, help="Terminales existentes en el mock")
+    parser.add_argument("--json", help="Archivo donde agregar los resultados (JSONL)")
+    parser.add_argument("--profile", action="store_true", help="Perfilar CPU por etapa en cada escenario")
+    args = parser.parse_args()
+
+    state_kwargs = {"latency": args.latency, "jitter": args.jitter,
+                    "error_rate": args.error_rate, "throttle_rate": args.throttle_rate}
+    results = run(args.sizes, args.workers, args.scenarios, state_kwargs, args.seed, args.profile)
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# tools/mock_tem_server.py
+"""
+Servidor local que imita los endpoints del TEM que usa la automatización.
+
+    python -m tools.mock_tem_server --port 8765 --latency 0.02 --throttle-rate 0.01
+
+Luego apuntar la app con TEM_BASE_URL=http://127.0.0.1:8765
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CSRF_TOKEN = "mock-csrf-token"
+SESSION_COOKIE = "JSESSIONID"
+
+LOGIN_PAGE = b"""<!doctype html><html><body>
+<form method="post" action="/emgui/login">
+<input name="username"><input name="password" type="password"><button>Entrar</button>
+</form></body></html>"""
+
+
+class MockTEMState:
+    """Terminales en memoria + configuración de latencia y fallas inyectadas."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.terminals = {}      # id → terminal
+        self.by_signature = {}   # SIGNATURE normalizado → id
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def seed(self, count: int, prefix: str = "SEED"):
+        """Crea `count` terminales existentes (para probar updates y el prefetch)."""
+        for i in range(count):
+            self.save({"signature": f"{prefix}{i}", "name": f"{prefix}{i}", "type": "AXIUMNX"})
+
+    def save(self, terminal: dict) -> str:
+        with self._lock:
+            key = str(terminal.get("signature", "")).strip().upper()
+            term_id = terminal.get("id") or self.by_signature.get(key) or f"mock:{next(self._ids)}"
+            self.terminals[term_id] = {
+                "id": term_id,
+                "signature": terminal.get("signature"),
+                "name": terminal.get("name"),
+                "type": terminal.get("type")
+            }
+            self.by_signature[key] = term_id
+            return term_id
+
+    def delete(self, ids) -> int:
+        with self._lock:
+            deleted = 0
+            for term_id in ids:
+                term = self.terminals.pop(term_id, None)
+                if term:
+                    self.by_signature.pop(str(term["signature"]).strip().upper(), None)
+                    deleted += 1
+            return deleted
+
+    def search(self, signature=None):
+        with self._lock:
+            if signature is not None:
+                term_id = self.by_signature.get(str(signature).strip().upper())
+                return [self.terminals[term_id]] if term_id else []
+            return sorted(self.terminals.values(), key=lambda t: str(t["name"]))
+
+
+class MockTEMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como el TEM real
+    state: MockTEMState = None
+
+    def log_message(self, *args):
+        pass
+
+    # ---------- utilidades ----------
+    def parse_request(self):
+        self._raw_body = None
+        return super().parse_request()
+
+    def _raw(self):
+        """
+        Lee el cuerpo una sola vez. También se lee antes de responder un error:
+        si quedara en el socket, la próxima petición keep-alive llegaría corrupta.
+        """
+        if self._raw_body is None:
+            length = int(self.headers.get("Content-Length") or 0)
+            self._raw_body = self.rfile.read(length) if length else b""
+        return self._raw_body
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        self._raw()
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        raw = self._raw()
+        return json.loads(raw) if raw else None
+
+    def _logged_in(self):
+        return f"{SESSION_COOKIE}=" in (self.headers.get("Cookie") or "")
+
+    def _inject(self):
+        """Aplica latencia y fallas configuradas. Devuelve True si ya respondió."""
+        st = self.state
+        with st._lock:
+            st.requests += 1
+        delay = st.latency + random.uniform(0, st.jitter)
+        if delay:
+            time.sleep(delay)
+        roll = random.random()
+        if roll < st.throttle_rate:
+            self._send(429, {"error": "Too Many Requests"}, headers={"Retry-After": str(st.retry_after)})
+            return True
+        if roll < st.throttle_rate + st.error_rate:
+            self._send(500, b"<html><body>Internal Server Error</body></html>", "text/html")
+            return True
+        return False
+
+    def _check_auth(self):
+        if not self._logged_in():
+            self._send(401, {"error": "Unauthorized"})
+            return False
+        if self.headers.get("x-csrf-token") != CSRF_TOKEN:
+            self._send(403, {"error": "Invalid CSRF token"})
+            return False
+        return True
+
+    # ---------- rutas ----------
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path in ("/emgui", "/emgui/"):
+            return self._send(200, LOGIN_PAGE, "text/html")
+        if url.path == "/emgui/rest/home/context":
+            if not self._logged_in():
+                return self._send(401, {"error": "Unauthorized"})
+            return self._send(200, {"user": "mock"}, headers={"x-csrf-token": CSRF_TOKEN})
+        if url.path.endswith("/validateTerminalSignature/"):
+            if self._inject() or not self._check_auth():
+                return
+            signature = parse_qs(url.query).get("signature", [""])[0]
+            return self._send(200, bool(signature.strip()))
+        self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/emgui/login":
+            return self._send(302, b"", "text/html", headers={
+                "Location": "/emgui/",
+                "Set-Cookie": f"{SESSION_COOKIE}=mock-session; Path=/"
+            })
+        if url.path.endswith("/terminalLights/"):
+            if self._inject() or not self._check_auth():
+                return
+            query = parse_qs(url.query)
+            start = int(query.get("start", ["0"])[0])
+            length = int(query.get("length", ["100"])[0])
+            body = self._body() or {}
+            signature = None
+            for crit in body.get("criteriaAndList", []):
+                if crit.get("key", {}).get("header") == "SIGNATURE":
+                    signature = crit.get("value")
+            items = self.state.search(signature)
+            return self._send(200, {"data": items[start:start + length], "recordsTotal": len(items)})
+        if url.path.endswith("/deleteTerminals/"):
+            if self._inject() or not self._check_auth():
+                return
+            body = self._body()
+            ids = body.get("ids") if isinstance(body, dict) else body
+            if not isinstance(ids, list):
+                return self._send(400, {"error": "Formato inválido"})
+            return self._send(200, {"deleted": self.state.delete(ids)})
+        self._send(404, {"error": "Not found"})
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/saveOrUpdateTerminal/"):
+            if self._inject() or not self._check_auth():
+                return
+            body = self._body() or {}
+            terminal = body.get("terminalAndGeolocation") or {}
+            if not terminal.get("signature"):
+                return self._send(400, {"error": "signature requerido"})
+            return self._send(200, self.state.save(terminal))
+        self._send(404, {"error": "Not found"})
+
+
+def start_server(port: int = 0, host: str = "127.0.0.1", state: MockTEMState = None):
+    """Arranca el mock en un hilo. Devuelve (server, base_url, state)."""
+    state = state or MockTEMState()
+    handler = type("BoundMockTEMHandler", (MockTEMHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-tem", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}", state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock local del TEM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia base por petición (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latencia aleatoria extra (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0, help="Terminales precargados en Migración")
+    args = parser.parse_args()
+
+    state = MockTEMState(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after)
+    state.seed(args.seed)
+    server, base_url, _ = start_server(args.port, args.host, state)
+    print(f"Mock TEM escuchando en {base_url} (TEM_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()